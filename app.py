@@ -1,22 +1,82 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, send_file
 from scraper.scraper import ScraperEngine
 from scraper.summarizer import SummarizerEngine
+from scraper.http_client import get_client
+from scraper.export import create_exporter, find_export
+from scraper.search import get_index
+from scraper.runtime import WarmUp
+from scraper.memory import get_budget
+from scraper import qos, singleflight
 import logging
+import os
+import threading
+import time
 
 app = Flask(__name__)
-summarizer = SummarizerEngine()
+
+# Built on first use (or during warm-up), not at import: a pre-fork server
+# imports this module once in the master, before any pools or threads exist
+_summarizer = None
+_summarizer_lock = threading.Lock()
+
+warm_up = WarmUp()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def get_summarizer():
+    global _summarizer
+    if _summarizer is None:
+        with _summarizer_lock:
+            if _summarizer is None:
+                _summarizer = SummarizerEngine()
+    return _summarizer
+
+def warm_up_steps():
+    """
+    What a process sets up before taking traffic: the shared HTTP client
+    (plus connections to SCRAPER_WARM_URLS, comma-separated), the summarizer
+    with one parse/rank pass, and the search index manifest.
+    """
+    warm_urls = [u.strip() for u in os.environ.get('SCRAPER_WARM_URLS', '').split(',') if u.strip()]
+    return [
+        ('http_client', lambda: get_client().prewarm(warm_urls)),
+        ('summarizer', lambda: get_summarizer().warm_up()),
+        ('search_index', lambda: get_index().stats()),
+    ]
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy"}), 200
+    # Liveness: answers as soon as the process serves, warm or not
+    return jsonify({"status": "healthy", "warm_up": warm_up.state}), 200
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    # Readiness probes arrive before traffic, so under servers that do not
+    # warm workers themselves (see serve.py) the first probe starts warm-up
+    warm_up.start(warm_up_steps())
+    stats = warm_up.stats()
+    return jsonify(stats), 200 if warm_up.ready else 503
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({
+        "http": get_client().stats(),
+        "coalescing": singleflight.stats(),
+        "qos": qos.stats(),
+        "summary_cache": get_summarizer().cache.stats(),
+        "memory": {
+            "budget": get_budget().stats(),
+            "summaries": get_summarizer().memory.stats(),
+        },
+        "index": get_index().stats(),
+        "process": warm_up.stats(),
+    }), 200
 
 @app.route('/scrape', methods=['POST'])
 def scrape():
@@ -28,39 +88,109 @@ def scrape():
         if not base_url:
             return jsonify({"error": "URL is required"}), 400
             
+        # Exports stream to disk; by default they replace the inline JSON data
+        export_format = data.get('export')
+        delta = data.get('delta', False)
+        include_data = data.get('include_data', not (export_format or delta))
+
         config = {
             'max_pages': data.get('max_pages', 5),
             'depth': data.get('depth', 2),
             'links_per_page': data.get('links_per_page', 5),
+            'max_seconds': data.get('max_seconds'),
+            'max_bytes': data.get('max_bytes'),
+            'keep_results': include_data,
+            'delta': delta,
+            'mode': data.get('mode', 'links'),
+            'incremental': data.get('incremental', False),
+            'respect_robots': data.get('respect_robots', data.get('mode') == 'sitemap'),
+            'boilerplate': data.get('boilerplate', False),
+            'index': data.get('index', False),
+            'frontier': {
+                'strategy': data.get('link_strategy', 'best_first'),
+                'weights': data.get('link_weights'),
+            },
             'sections': {
                 'title': data.get('scrape_title', False),
                 'meta_description': data.get('scrape_meta', False),
                 'headings': data.get('scrape_headings', False),
                 'paragraphs': data.get('scrape_paragraphs', False),
                 'tables': data.get('scrape_tables', False),
+                'table_format': data.get('table_format', 'rows'),
+                'table_types': data.get('table_types', False),
                 'links': data.get('scrape_links', False),
                 'images': data.get('scrape_images', False),
+                'probe_images': data.get('probe_images', False),
             }
         }
         
         logger.info(f"Starting scrape for {base_url} with config: {config}")
         
-        engine = ScraperEngine(base_url, config)
-        results = engine.run()
+        exporter = None
+        try:
+            engine = ScraperEngine(base_url, config)
+            if export_format:
+                exporter = create_exporter(export_format)
+                engine.add_sink(exporter)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            results = engine.run()
+        except Exception:
+            if exporter:
+                exporter.abort()
+            raise
         
         if isinstance(results, dict) and "error" in results:
+             if exporter:
+                 exporter.abort()
              return jsonify(results), 400
-             
-        return jsonify({
+
+        response = {
             "message": "Scraping completed successfully",
-            "count": len(results),
+            "count": engine.pages_scraped,
+            "stop_reason": engine.stop_reason,
+            "stats": engine.stats(),
             "data": results
-        })
+        }
+        if exporter:
+            exporter.close()
+            response["export"] = exporter.info()
+        if engine.delta is not None:
+            response["delta"] = engine.delta
+
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"Error in /scrape: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/exports/<export_id>', methods=['GET'])
+def download_export(export_id):
+    path = find_export(export_id)
+    if not path:
+        return jsonify({"error": "Export not found"}), 404
+    return send_file(os.path.abspath(path), as_attachment=True)
+
+@app.route('/search', methods=['GET'])
+def search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Query parameter 'q' is required"}), 400
+    try:
+        k = min(100, max(1, int(request.args.get('k', 10))))
+    except ValueError:
+        return jsonify({"error": "k must be an integer"}), 400
+
+    started = time.perf_counter()
+    results = get_index().search(query, k)
+    return jsonify({
+        "query": query,
+        "results": results,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    })
+
 @app.route('/summarizer')
 def summarizer_page():
     return render_template('summarizer.html')
@@ -71,15 +201,26 @@ def summarize():
         data = request.get_json()
         url = data.get('url')
         length = data.get('length', 'medium')
+        incremental = data.get('incremental', False)
+        boilerplate = data.get('boilerplate', False)
         
         if not url:
             return jsonify({'error': 'No URL provided'}), 400
             
-        result = summarizer.generate_summary(url, length)
+        # Someone is waiting: run ahead of crawls, within the interactive deadline
+        with qos.lane(qos.INTERACTIVE):
+            result = get_summarizer().generate_summary(
+                url, length, incremental=incremental, boilerplate=boilerplate
+            )
         return jsonify(result)
+    except qos.QueueTimeout as e:
+        logger.warning(f"Summary for {url} timed out in queue: {e}")
+        return jsonify({"error": "Server busy, please try again"}), 503
     except Exception as e:
         logger.error(f"Error in /summarize: {e}")
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
+    # Development server; use serve.py for production
+    warm_up.start(warm_up_steps())
     app.run(debug=True, port=5000)
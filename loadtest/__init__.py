@@ -0,0 +1,7 @@
+"""
+Load-testing harness for the scraper API: a local stand-in website,
+a mixed-workload runner and a comparison of saved runs.
+
+    python -m loadtest run --duration 30 --concurrency 8
+    python -m loadtest compare loadtest_results/before.json loadtest_results/after.json
+"""
@@ -0,0 +1,174 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+from .runner import LoadRunner, compare, load, save
+from .site import StandInSite
+
+RESULTS_DIR = 'loadtest_results'
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def add_site_options(parser):
+    parser.add_argument('--latency-ms', type=float, default=50, help="delay before each stand-in response")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="random +/- variation of the delay")
+    parser.add_argument('--page-kb', type=float, default=20, help="approximate HTML size per page")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with 503")
+
+
+def build_site(args, port=0):
+    return StandInSite(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        page_kb=args.page_kb,
+        error_rate=args.error_rate,
+        port=port
+    )
+
+
+def serve_app():
+    """
+    Serves app.py in this process on a free port; returns (url, server).
+    """
+    from werkzeug.serving import make_server
+    from app import app
+
+    # One access log line per request would dominate the output
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def cmd_site(args):
+    site = build_site(args, port=args.port).start()
+    print(f"Stand-in site at {site.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        site.stop()
+
+
+def cmd_run(args):
+    site = None
+    server = None
+    site_url = args.site
+    if not site_url:
+        site = build_site(args).start()
+        site_url = site.url
+
+    target = args.target
+    pid = args.pid
+    if not target:
+        target, server = serve_app()
+        print("Serving app.py in-process; memory and threads include the load generator. "
+              "Use --target and --pid against a separate server for exact numbers.")
+
+    try:
+        runner = LoadRunner(
+            target,
+            site_url,
+            mix=parse_mix(args.mix),
+            concurrency=args.concurrency,
+            rate=args.rate,
+            duration=args.duration,
+            pages=args.pages,
+            scrape_pages=args.scrape_pages,
+            pid=pid,
+            seed=args.seed
+        )
+        result = runner.run()
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if server:
+            server.shutdown()
+        if site:
+            site.stop()
+
+    result['name'] = args.name
+    if site:
+        result['config']['site'] = {
+            'latency_ms': args.latency_ms,
+            'jitter_ms': args.jitter_ms,
+            'page_kb': args.page_kb,
+            'error_rate': args.error_rate,
+        }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{args.name or 'run'}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    save(result, output)
+    print_result(result)
+    print(f"\nSaved to {output}")
+    return 0
+
+
+def cmd_compare(args):
+    rows = compare(load(args.baseline), load(args.candidate))
+    print(f"{'scope':<12}{'metric':<16}{'baseline':>12}{'candidate':>12}{'change':>10}  verdict")
+    for scope, metric, old, new, change, verdict in rows:
+        change_text = '-' if change is None else f"{change:+.1f}%"
+        print(f"{scope:<12}{metric:<16}{old:>12}{new:>12}{change_text:>10}  {verdict}")
+    return 0
+
+
+def print_result(result):
+    print(f"{'endpoint':<12}{'requests':>9}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    scopes = list(result['endpoints'].items()) + [('overall', result['overall'])]
+    for name, metrics in scopes:
+        print(f"{name:<12}{metrics['requests']:>9}{metrics['errors']:>8}{metrics['throughput_rps']:>9}"
+              f"{metrics['p50_ms']:>10}{metrics['p95_ms']:>10}{metrics['p99_ms']:>10}")
+    process = result['process']
+    print(f"peak RSS {process['peak_rss_mb']} MB, peak threads {process['peak_threads']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m loadtest', description="Load-testing harness for the scraper API.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    site = commands.add_parser('site', help="serve the stand-in website")
+    add_site_options(site)
+    site.add_argument('--port', type=int, default=8001)
+    site.set_defaults(func=cmd_site)
+
+    run = commands.add_parser('run', help="run a load test and save the results")
+    add_site_options(run)
+    run.add_argument('--target', help="base URL of a running app (default: serve app.py in-process)")
+    run.add_argument('--pid', type=int, help="process to sample memory/threads of (with --target)")
+    run.add_argument('--site', help="base URL of the site to scrape (default: start the stand-in site)")
+    run.add_argument('--mix', default='scrape=0.3,summarize=0.7',
+                     help="endpoint weights, e.g. scrape=1,summarize=2,search=1,health=1")
+    run.add_argument('--concurrency', type=int, default=4, help="concurrent clients (closed loop)")
+    run.add_argument('--rate', type=float, help="requests per second (open loop) instead of fixed concurrency")
+    run.add_argument('--duration', type=float, default=10, help="seconds to generate load")
+    run.add_argument('--pages', type=int, default=200, help="distinct stand-in pages to request")
+    run.add_argument('--scrape-pages', type=int, default=3, help="max_pages per /scrape request")
+    run.add_argument('--seed', type=int, help="random seed for a repeatable request sequence")
+    run.add_argument('--name', help="label stored with the results")
+    run.add_argument('--output', help=f"results file (default: {RESULTS_DIR}/<name>-<time>.json)")
+    run.set_defaults(func=cmd_run)
+
+    diff = commands.add_parser('compare', help="compare two saved runs")
+    diff.add_argument('baseline')
+    diff.add_argument('candidate')
+    diff.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,276 @@
+import json
+import math
+import os
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+from scraper.runtime import process_memory
+
+ENDPOINTS = ('scrape', 'summarize', 'search', 'health')
+
+DEFAULT_MIX = {'scrape': 0.3, 'summarize': 0.7}
+
+# Metrics shown by compare(), with the direction that counts as better
+COMPARED_METRICS = [
+    ('throughput_rps', 'higher'),
+    ('p50_ms', 'lower'),
+    ('p95_ms', 'lower'),
+    ('p99_ms', 'lower'),
+    ('error_rate', 'lower'),
+]
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers (0 for an empty list).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize_latencies(samples, elapsed):
+    """
+    samples: list of (latency_seconds, ok). Returns the metrics of one endpoint.
+    """
+    latencies = [latency * 1000 for latency, _ in samples]
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(max(latencies), 2) if latencies else 0.0,
+    }
+
+
+class ProcessSampler:
+    """
+    Samples resident memory and thread count of a process in the background
+    and keeps the peaks. Reads /proc on Linux; elsewhere it can only watch
+    the current process.
+    """
+
+    def __init__(self, pid=None, interval=0.2):
+        self.pid = pid or os.getpid()
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_threads = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.sample()
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+        return {
+            'pid': self.pid,
+            'peak_rss_mb': round(self.peak_rss / (1024 * 1024), 1),
+            'peak_threads': self.peak_threads,
+        }
+
+    def sample(self):
+        rss, threads = process_memory(self.pid)
+        self.peak_rss = max(self.peak_rss, rss)
+        self.peak_threads = max(self.peak_threads, threads)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+
+class LoadRunner:
+    """
+    Drives a mixed /scrape + /api/summarize (+ /search, /health) workload
+    against a running app, either closed-loop with a fixed number of
+    concurrent clients or open-loop at a fixed request rate.
+
+    In rate mode latency is measured from each request's scheduled start,
+    so time spent queueing behind a slow server counts against it.
+    """
+
+    def __init__(self, target, site_url, mix=None, concurrency=4, rate=None, duration=10,
+                 pages=200, scrape_pages=3, timeout=60, pid=None, seed=None):
+        self.target = target.rstrip('/')
+        self.site_url = site_url.rstrip('/')
+        self.mix = mix or DEFAULT_MIX
+        unknown = set(self.mix) - set(ENDPOINTS)
+        if unknown:
+            raise ValueError(f"Unknown endpoints in mix: {', '.join(sorted(unknown))}")
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.pages = pages
+        self.scrape_pages = scrape_pages
+        self.timeout = timeout
+        self.pid = pid
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.samples = {endpoint: [] for endpoint in self.mix}
+        self.samples_lock = threading.Lock()
+        self.local = threading.local()
+
+    def run(self):
+        sampler = ProcessSampler(self.pid).start()
+        started = time.monotonic()
+        if self.rate:
+            self._run_rate(started)
+        else:
+            self._run_concurrency(started)
+        elapsed = time.monotonic() - started
+        process = sampler.stop()
+
+        all_samples = [sample for samples in self.samples.values() for sample in samples]
+        return {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_commit': self._git_commit(),
+            'config': {
+                'mix': self.mix,
+                'mode': 'rate' if self.rate else 'concurrency',
+                'rate': self.rate,
+                'concurrency': self.concurrency,
+                'duration': self.duration,
+                'pages': self.pages,
+                'scrape_pages': self.scrape_pages,
+            },
+            'elapsed': round(elapsed, 3),
+            'overall': summarize_latencies(all_samples, elapsed),
+            'endpoints': {
+                endpoint: summarize_latencies(samples, elapsed)
+                for endpoint, samples in self.samples.items()
+            },
+            'process': process,
+        }
+
+    def _run_concurrency(self, started):
+        deadline = started + self.duration
+
+        def client():
+            while time.monotonic() < deadline:
+                self._request(self._pick(), time.monotonic())
+
+        threads = [threading.Thread(target=client, daemon=True) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _run_rate(self, started):
+        interval = 1.0 / self.rate
+        total = int(self.duration * self.rate)
+        # Enough workers that a slow server builds a queue on its side, not ours
+        with ThreadPoolExecutor(max_workers=max(self.concurrency, 64), thread_name_prefix='load') as executor:
+            for n in range(total):
+                scheduled = started + n * interval
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._request, self._pick(), scheduled)
+
+    def _pick(self):
+        with self.random_lock:
+            endpoint = self.random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+            page = self.random.randint(1, self.pages)
+        return endpoint, f"{self.site_url}/articles/{page}"
+
+    def _session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def _request(self, job, scheduled):
+        endpoint, page_url = job
+        session = self._session()
+        ok = False
+        try:
+            if endpoint == 'scrape':
+                response = session.post(f"{self.target}/scrape", json={
+                    'url': page_url,
+                    'max_pages': self.scrape_pages,
+                    'depth': 2,
+                    'scrape_title': True,
+                    'scrape_paragraphs': True,
+                }, timeout=self.timeout)
+            elif endpoint == 'summarize':
+                response = session.post(f"{self.target}/api/summarize", json={'url': page_url}, timeout=self.timeout)
+            elif endpoint == 'search':
+                response = session.get(f"{self.target}/search", params={'q': 'crawler summarizer'}, timeout=self.timeout)
+            else:
+                response = session.get(f"{self.target}/health", timeout=self.timeout)
+            ok = response.status_code < 400
+            if ok and endpoint != 'health':
+                ok = 'error' not in response.json()
+        except (requests.exceptions.RequestException, ValueError):
+            ok = False
+        latency = time.monotonic() - scheduled
+        with self.samples_lock:
+            self.samples[endpoint].append((latency, ok))
+
+    @staticmethod
+    def _git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, timeout=5, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+
+def save(result, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(result, handle, indent=2)
+    return path
+
+
+def load(path):
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def compare(baseline, candidate):
+    """
+    Returns rows (scope, metric, baseline, candidate, change_pct, verdict)
+    comparing two saved runs, overall and per endpoint.
+    """
+    rows = []
+    scopes = [('overall', baseline['overall'], candidate['overall'])]
+    for endpoint in sorted(set(baseline['endpoints']) & set(candidate['endpoints'])):
+        scopes.append((endpoint, baseline['endpoints'][endpoint], candidate['endpoints'][endpoint]))
+
+    for scope, before, after in scopes:
+        for metric, better in COMPARED_METRICS:
+            old, new = before.get(metric, 0), after.get(metric, 0)
+            change = round((new - old) / old * 100, 1) if old else None
+            if old == new:
+                verdict = 'same'
+            elif (new > old) == (better == 'higher'):
+                verdict = 'better'
+            else:
+                verdict = 'worse'
+            rows.append((scope, metric, old, new, change, verdict))
+
+    for metric in ('peak_rss_mb', 'peak_threads'):
+        old, new = baseline['process'].get(metric, 0), candidate['process'].get(metric, 0)
+        change = round((new - old) / old * 100, 1) if old else None
+        verdict = 'same' if old == new else ('better' if new < old else 'worse')
+        rows.append(('process', metric, old, new, change, verdict))
+    return rows
@@ -0,0 +1,117 @@
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+WORDS = (
+    "the crawler fetches pages from a site and follows links to discover new content "
+    "while the parser builds a tree that extractors walk to collect headings paragraphs "
+    "tables and images for each page so the summarizer can rank sentences by importance "
+    "and return a short overview of what the article says about data systems and networks"
+).split()
+
+
+class StandInSite:
+    """
+    Local website for load tests. Every path returns a deterministic
+    article page (seeded by the path) that links to other pages, after a
+    configurable delay; a share of requests fail with 503.
+    """
+
+    def __init__(self, latency_ms=50, jitter_ms=0, page_kb=20, error_rate=0.0, links=10, host='127.0.0.1', port=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.page_kb = page_kb
+        self.error_rate = error_rate
+        self.links = links
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def page(self, path):
+        rng = random.Random(path)
+        paragraphs = []
+        size = 0
+        while size < self.page_kb * 1024:
+            sentences = []
+            for _ in range(rng.randint(3, 6)):
+                words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+                sentences.append(' '.join(words).capitalize() + '.')
+            paragraph = f"<p>{' '.join(sentences)}</p>"
+            paragraphs.append(paragraph)
+            size += len(paragraph)
+        links = ''.join(
+            f'<li><a href="/articles/{rng.randint(1, 10000)}">Article {n}</a></li>'
+            for n in range(self.links)
+        )
+        return (
+            f"<html><head><title>Article {path}</title>"
+            f'<meta name="description" content="Stand-in page {path}"></head>'
+            f"<body><nav><ul>{links}</ul></nav><main><h1>Article {path}</h1>"
+            f"{''.join(paragraphs)}</main><footer>Stand-in site</footer></body></html>"
+        )
+
+    def _delay(self):
+        delay = self.latency_ms
+        if self.jitter_ms:
+            delay += random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                site._delay()
+                with site.lock:
+                    site.requests += 1
+                    failed = random.random() < site.error_rate
+                    if failed:
+                        site.errors += 1
+                if failed:
+                    self.send_response(503)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if self.path == '/robots.txt':
+                    body = b"User-agent: *\nAllow: /\n"
+                    content_type = 'text/plain'
+                else:
+                    body = site.page(self.path).encode('utf-8')
+                    content_type = 'text/html; charset=utf-8'
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,221 @@
+import hashlib
+import re
+import threading
+
+from .state import StateStore
+from .utils import canonical_url, normalize_url
+
+# DOM blocks that usually hold site chrome, plus containers whose id/class
+# hints at it. Their text is fingerprinted as a whole.
+BLOCK_TAGS = ['header', 'footer', 'nav', 'aside', 'form']
+BLOCK_NAMES = frozenset(BLOCK_TAGS + ['div', 'section'])
+BLOCK_HINT = re.compile(r'cookie|consent|banner|sidebar|menu|newsletter|share|social|breadcrumb|related', re.IGNORECASE)
+
+# Text blocks are fingerprinted individually
+TEXT_TAGS = ['p', 'li']
+MIN_TEXT_LENGTH = 20
+
+
+def fingerprint(kind, text):
+    """
+    Hash of normalized text. Case, whitespace and digits are ignored so
+    e.g. copyright years or comment counts don't break the match.
+    """
+    normalized = re.sub(r'\d+', '0', ' '.join(text.lower().split()))
+    return kind + hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class TemplateIndex:
+    """
+    Learns which DOM blocks, text blocks and links recur across the pages
+    of one site. Once a fingerprint is seen on at least `min_pages` pages
+    and `ratio` of all pages, it is treated as boilerplate. Each page (by
+    URL, or by content without one) is learned once, so revisiting a page
+    never makes its own text look site-wide. Once `LEARN_ALL` pages are
+    learned the template is considered settled and only every
+    `LEARN_EVERY`-th new page is learned.
+    """
+
+    # Keep the in-memory/on-disk index bounded on very large sites
+    MAX_ENTRIES = 200000
+
+    LEARN_ALL = 20
+    LEARN_EVERY = 10
+
+    def __init__(self, domain, store=None, min_pages=3, ratio=0.5):
+        self.domain = domain
+        self.store = store
+        self.min_pages = min_pages
+        self.ratio = ratio
+        self.counts = {}
+        self.pages = 0
+        # Keys of the pages learned so far, oldest first
+        self.learned = {}
+        # New pages offered since the template settled (see learn)
+        self.offered = 0
+        self.lock = threading.Lock()
+        self.blocks_removed = 0
+        self.texts_skipped = 0
+        self.links_skipped = 0
+
+        if store:
+            state = store.load(domain)
+            self.pages = state.get('pages', 0)
+            self.counts = state.get('counts', {})
+            self.learned = dict.fromkeys(state.get('learned', []))
+
+    def is_boilerplate(self, key):
+        count = self.counts.get(key, 0)
+        return count >= self.min_pages and count >= self.ratio * self.pages
+
+    def is_boilerplate_text(self, text):
+        if len(text) <= MIN_TEXT_LENGTH:
+            return False
+        if self.is_boilerplate(fingerprint('t', text)):
+            with self.lock:
+                self.texts_skipped += 1
+            return True
+        return False
+
+    def is_boilerplate_link(self, href, text):
+        if self.is_boilerplate(fingerprint('l', f"{href} {text}")):
+            with self.lock:
+                self.links_skipped += 1
+            return True
+        return False
+
+    def learn(self, soup, url=None):
+        """
+        Counts every block fingerprint on the page once. Pages learned
+        before, and most new pages once the template has settled, are
+        skipped. Returns True if the page was learned.
+        """
+        page_key = self._page_key(url) if url else None
+        with self.lock:
+            if page_key in self.learned:
+                return False
+            if self.pages >= self.LEARN_ALL:
+                self.offered += 1
+                if self.offered % self.LEARN_EVERY:
+                    return False
+
+        keys = set()
+        # Text and links inside blocks that are already boilerplate are
+        # counted through the block; don't fingerprint them one by one
+        known = set()
+        for key, block in self._blocks(soup):
+            keys.add(key)
+            if self.is_boilerplate(key):
+                known.update(id(tag) for tag in block.find_all(TEXT_TAGS + ['a']))
+        for tag in soup.find_all(TEXT_TAGS):
+            if id(tag) in known:
+                continue
+            text = tag.get_text(" ", strip=True)
+            if len(text) > MIN_TEXT_LENGTH:
+                keys.add(fingerprint('t', text))
+        for a_tag in soup.find_all('a', href=True):
+            if id(a_tag) in known:
+                continue
+            keys.add(fingerprint('l', f"{self._href(a_tag['href'], url)} {a_tag.get_text(' ', strip=True)}"))
+
+        page_key = page_key or self._page_key(None, keys)
+        with self.lock:
+            if page_key in self.learned:
+                return False
+            self.learned[page_key] = None
+            if len(self.learned) > self.MAX_ENTRIES:
+                # Forget the oldest half; relearning one of them only adds one count
+                self.learned = dict.fromkeys(list(self.learned)[len(self.learned) // 2:])
+            self.pages += 1
+            for key in keys:
+                self.counts[key] = self.counts.get(key, 0) + 1
+            if len(self.counts) > self.MAX_ENTRIES:
+                self._prune()
+        return True
+
+    def strip(self, soup):
+        """
+        Removes known boilerplate DOM blocks from the tree before extraction.
+        Returns the number of blocks removed.
+        """
+        removed = 0
+        for key, block in self._blocks(soup):
+            if self.is_boilerplate(key):
+                block.decompose()
+                removed += 1
+        with self.lock:
+            self.blocks_removed += removed
+        return removed
+
+    def save(self):
+        if not self.store:
+            return
+        with self.lock:
+            # Fingerprints seen once are almost never boilerplate; don't persist them
+            counts = {key: count for key, count in self.counts.items() if count > 1}
+            state = {'pages': self.pages, 'counts': counts, 'learned': list(self.learned)}
+        self.store.save(self.domain, state)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'pages_learned': self.pages,
+                'fingerprints': len(self.counts),
+                'blocks_removed': self.blocks_removed,
+                'texts_skipped': self.texts_skipped,
+                'links_skipped': self.links_skipped,
+            }
+
+    def _blocks(self, soup):
+        blocks = []
+        outer = set()
+        # A plain walk with a set lookup; find_all() with a list of names
+        # matches every tag against each name
+        for tag in soup.descendants:
+            if tag.name not in BLOCK_NAMES or (tag.name not in BLOCK_TAGS and not self._hinted(tag)):
+                continue
+            outer.add(id(tag))
+            # Nested matches are covered by their outermost block
+            if any(id(parent) in outer for parent in tag.parents):
+                continue
+            text = tag.get_text(" ", strip=True)
+            if text:
+                blocks.append((fingerprint('b' + tag.name, text), tag))
+        return blocks
+
+    @staticmethod
+    def _hinted(tag):
+        classes = tag.get('class') or []
+        hint = ' '.join(classes) + ' ' + (tag.get('id') or '')
+        return bool(BLOCK_HINT.search(hint))
+
+    @staticmethod
+    def _page_key(url, keys=()):
+        identity = canonical_url(url) if url else ' '.join(sorted(keys))
+        return hashlib.blake2b(identity.encode('utf-8'), digest_size=8).hexdigest()
+
+    @staticmethod
+    def _href(href, url):
+        return (normalize_url(url, href) if url else href) or href
+
+    def _prune(self):
+        threshold = 1
+        while len(self.counts) > self.MAX_ENTRIES // 2:
+            self.counts = {key: count for key, count in self.counts.items() if count > threshold}
+            threshold += 1
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_template(domain, directory=None):
+    """
+    Returns the process-wide TemplateIndex for a domain, loading the
+    template learned by earlier runs from the state store.
+    """
+    key = (domain, directory)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = TemplateIndex(domain, StateStore('templates', directory))
+        return _indexes[key]
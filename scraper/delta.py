@@ -0,0 +1,112 @@
+import hashlib
+import json
+import threading
+
+from .state import StateStore
+
+
+def content_hash(value):
+    """
+    Short, stable hash of an extracted section value.
+    """
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(encoded.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class DeltaTracker:
+    """
+    Compares scraped pages against the per-URL, per-section content hashes
+    stored by the previous run and collects only what changed.
+
+    Stored layout (one gzip JSON file per domain) keeps section names once:
+    {'sections': [name, ...], 'pages': {url: [hash or None, ...]}}
+    """
+
+    def __init__(self, key, store=None):
+        self.key = key
+        self.store = store or StateStore('delta')
+        self.previous = self._unpack(self.store.load(key))
+        self.current = {}
+        self.added = []
+        self.changed = []
+        self.unchanged = 0
+        self.lock = threading.Lock()
+
+    def write(self, page):
+        """
+        Sink interface: classify a freshly scraped page as added, changed or unchanged.
+        """
+        url = page['url']
+        hashes = {section: content_hash(value) for section, value in page.items() if section != 'url'}
+        previous = self.previous.get(url)
+
+        with self.lock:
+            self.current[url] = hashes
+            if previous is None:
+                self.added.append(page)
+                return
+
+            changed = {
+                section: page[section]
+                for section, digest in hashes.items()
+                if previous.get(section) != digest
+            }
+            if changed:
+                self.changed.append({'url': url, 'sections': changed})
+            else:
+                self.unchanged += 1
+
+    def keep(self, url):
+        """
+        Carries a page that was not refetched (e.g. 304 Not Modified) over as unchanged.
+        """
+        with self.lock:
+            if url in self.previous and url not in self.current:
+                self.current[url] = self.previous[url]
+                self.unchanged += 1
+
+    def finish(self, gone=(), complete=False):
+        """
+        Saves the new hashes and returns the delta.
+        `gone` are URLs that no longer exist (404/410). When `complete` is
+        True the crawl saw the whole site, so every previously known URL
+        not seen this time is reported as removed too.
+        """
+        with self.lock:
+            gone = set(gone)
+            # Sections this run did not extract keep their stored hashes
+            current = {url: {**self.previous.get(url, {}), **hashes} for url, hashes in self.current.items()}
+            if complete:
+                removed = {url for url in self.previous if url not in self.current}
+                removed |= gone & set(self.previous)
+                pages = current
+            else:
+                removed = gone & set(self.previous)
+                pages = dict(self.previous)
+                pages.update(current)
+            for url in removed:
+                pages.pop(url, None)
+
+            self.store.save(self.key, self._pack(pages))
+            return {
+                'added': self.added,
+                'changed': self.changed,
+                'removed': sorted(removed),
+                'unchanged': self.unchanged,
+            }
+
+    @staticmethod
+    def _pack(pages):
+        sections = sorted({section for hashes in pages.values() for section in hashes})
+        return {
+            'sections': sections,
+            'pages': {url: [hashes.get(section) for section in sections] for url, hashes in pages.items()},
+        }
+
+    @staticmethod
+    def _unpack(state):
+        sections = state.get('sections') or []
+        return {
+            url: {section: digest for section, digest in zip(sections, digests) if digest}
+            for url, digests in (state.get('pages') or {}).items()
+        }
@@ -0,0 +1,391 @@
+import abc
+import csv
+import gzip
+import importlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+
+EXPORT_DIR = os.environ.get('SCRAPER_EXPORT_DIR', 'exports')
+
+# Exports (and leftovers of crashed crawls) older than this are deleted
+# whenever a new export starts
+EXPORT_RETENTION = float(os.environ.get('SCRAPER_EXPORT_RETENTION_HOURS', 24)) * 3600
+
+# Flat row layout for each section. Used by the CSV and Parquet exporters so
+# every row of a section has the same columns and no repeated key names.
+SECTION_COLUMNS = {
+    'pages': [('url', 'str'), ('title', 'str'), ('meta_description', 'str')],
+    'headings': [('url', 'str'), ('position', 'int'), ('text', 'str')],
+    'paragraphs': [('url', 'str'), ('position', 'int'), ('text', 'str')],
+    'links': [('url', 'str'), ('position', 'int'), ('href', 'str'), ('text', 'str'),
+              ('type', 'str'), ('context', 'str')],
+    'images': [('url', 'str'), ('position', 'int'), ('src', 'str'), ('alt', 'str'),
+               ('width', 'str'), ('height', 'str'), ('format', 'str')],
+    'tables': [('url', 'str'), ('table', 'int'), ('row', 'int'), ('column', 'int'),
+               ('header', 'str'), ('value', 'str')],
+}
+
+_ID = r'[0-9a-f]{32}'
+EXPORT_ID = re.compile(rf'^{_ID}$')
+# Everything an exporter leaves in the export directory: finished exports,
+# partial files and section work directories
+EXPORT_ENTRY = re.compile(rf'^(?:{_ID}\.[\w.]+|\.{_ID}\.[\w.]+\.part|\.{_ID}-\w+)$')
+
+_optional_modules = {}
+
+
+def optional_module(name):
+    """
+    Imports an optional dependency on first use, or returns None if it is
+    not installed. pyarrow alone adds ~30 MB and tens of milliseconds to
+    every worker that imports this module but never writes Parquet.
+    """
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+
+def flatten_page(page):
+    """
+    Yields (section, row) pairs for a scraped page, one row per
+    heading/paragraph/link/image and one per table cell.
+    """
+    url = page.get('url')
+    yield 'pages', {
+        'url': url,
+        'title': page.get('title'),
+        'meta_description': page.get('meta_description'),
+    }
+
+    for section in ('headings', 'paragraphs'):
+        for position, text in enumerate(page.get(section) or []):
+            yield section, {'url': url, 'position': position, 'text': text}
+
+    for position, link in enumerate(page.get('links') or []):
+        yield 'links', dict(link, url=url, position=position)
+
+    for position, image in enumerate(page.get('images') or []):
+        yield 'images', dict(image, url=url, position=position)
+
+    for table_index, table in enumerate(page.get('tables') or []):
+        headers = table.get('headers') or []
+        rows = table.get('rows')
+        if rows is None:
+            # Column-oriented table
+            rows = zip(*table.get('columns') or [])
+        for row_index, row in enumerate(rows):
+            for column, value in enumerate(row):
+                yield 'tables', {
+                    'url': url,
+                    'table': table_index,
+                    'row': row_index,
+                    'column': column,
+                    'header': headers[column] if column < len(headers) else None,
+                    'value': value,
+                }
+
+
+class Exporter(abc.ABC):
+    """
+    Base class for exporters. Pages are written one at a time as the crawl
+    produces them to a hidden partial file; close() finalizes it and renames
+    it into place, so find_export never serves a file still being written.
+    """
+
+    extension = None
+
+    def __init__(self, export_dir=None):
+        self.export_id = uuid.uuid4().hex
+        self.export_dir = export_dir or EXPORT_DIR
+        os.makedirs(self.export_dir, exist_ok=True)
+        self.path = os.path.join(self.export_dir, f"{self.export_id}.{self.extension}")
+        self.partial_path = os.path.join(self.export_dir, f".{self.export_id}.{self.extension}.part")
+        self.pages = 0
+        self.closed = False
+
+    def write(self, page):
+        self.pages += 1
+
+    @abc.abstractmethod
+    def finish(self):
+        """
+        Flushes everything written so far to self.partial_path.
+        """
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.finish()
+            os.replace(self.partial_path, self.path)
+        return self.path
+
+    def abort(self):
+        """
+        Discards a partially written export.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.finish()
+        finally:
+            if os.path.exists(self.partial_path):
+                os.remove(self.partial_path)
+
+    def info(self):
+        return {
+            'id': self.export_id,
+            'format': self.format,
+            'pages': self.pages,
+            'bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            'download_url': f"/exports/{self.export_id}",
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
+
+
+class NDJSONExporter(Exporter):
+    """
+    One JSON document per line, optionally gzip or zstd compressed.
+    """
+
+    def __init__(self, compression=None, export_dir=None):
+        self.compression = compression
+        self.format = {None: 'ndjson', 'gzip': 'ndjson.gz', 'zstd': 'ndjson.zst'}[compression]
+        self.extension = self.format
+        super().__init__(export_dir)
+
+        if compression == 'gzip':
+            self.stream = gzip.open(self.partial_path, 'wt', encoding='utf-8')
+        elif compression == 'zstd':
+            zstandard = optional_module('zstandard')
+            if zstandard is None:
+                raise ValueError("The 'ndjson.zst' export format requires the 'zstandard' package")
+            raw = zstandard.ZstdCompressor().stream_writer(open(self.partial_path, 'wb'))
+            self.stream = io.TextIOWrapper(raw, encoding='utf-8')
+        else:
+            self.stream = open(self.partial_path, 'w', encoding='utf-8')
+
+    def write(self, page):
+        super().write(page)
+        self.stream.write(json.dumps(page, ensure_ascii=False, separators=(',', ':')))
+        self.stream.write('\n')
+
+    def finish(self):
+        if not self.stream.closed:
+            self.stream.close()
+
+
+class SectionExporter(Exporter):
+    """
+    Base for exporters that write one flat file per section and bundle
+    them into a single zip archive on close.
+    """
+
+    extension = 'zip'
+
+    def __init__(self, export_dir=None):
+        super().__init__(export_dir)
+        self.work_dir = tempfile.mkdtemp(prefix=f".{self.export_id}-", dir=self.export_dir)
+
+    def write(self, page):
+        super().write(page)
+        for section, row in flatten_page(page):
+            self.write_row(section, row)
+
+    @abc.abstractmethod
+    def write_row(self, section, row):
+        """
+        Appends one flattened row (see flatten_page) to its section's file.
+        """
+
+    @abc.abstractmethod
+    def finish_sections(self):
+        """
+        Flushes and closes the per-section files; returns their paths.
+        """
+
+    def finish(self):
+        try:
+            files = self.finish_sections()
+            with zipfile.ZipFile(self.partial_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for file_path in files:
+                    archive.write(file_path, os.path.basename(file_path))
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class CSVExporter(SectionExporter):
+    """
+    One CSV per section (pages, headings, paragraphs, links, images, tables)
+    in a zip archive. Table cells are flattened to one row per cell.
+    """
+
+    format = 'csv'
+
+    def __init__(self, export_dir=None):
+        super().__init__(export_dir)
+        self.files = {}
+
+    def write_row(self, section, row):
+        if section not in self.files:
+            handle = open(os.path.join(self.work_dir, f"{section}.csv"), 'w', newline='', encoding='utf-8')
+            columns = [name for name, _ in SECTION_COLUMNS[section]]
+            writer = csv.DictWriter(handle, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            self.files[section] = (handle, writer)
+        self.files[section][1].writerow(row)
+
+    def finish_sections(self):
+        paths = []
+        for handle, _ in self.files.values():
+            handle.close()
+            paths.append(handle.name)
+        return paths
+
+
+class ParquetExporter(SectionExporter):
+    """
+    One Parquet file per section in a zip archive. Rows are buffered into
+    column batches and appended as row groups, so memory stays bounded.
+    """
+
+    format = 'parquet'
+    batch_size = 10000
+
+    def __init__(self, export_dir=None):
+        self.pyarrow = optional_module('pyarrow')
+        if self.pyarrow is None or optional_module('pyarrow.parquet') is None:
+            raise ValueError("The 'parquet' export format requires the 'pyarrow' package")
+        super().__init__(export_dir)
+        self.buffers = {}
+        self.writers = {}
+        self.paths = []
+
+    def write_row(self, section, row):
+        columns = self.buffers.setdefault(section, {name: [] for name, _ in SECTION_COLUMNS[section]})
+        for name, kind in SECTION_COLUMNS[section]:
+            value = row.get(name)
+            # Typed table cells (see table_types) still go into string columns
+            columns[name].append(value if value is None or kind == 'int' else str(value))
+        if len(columns['url']) >= self.batch_size:
+            self.flush(section)
+
+    def flush(self, section):
+        columns = self.buffers.get(section)
+        if not columns or not columns['url']:
+            return
+        schema = self.schema(section)
+        table = self.pyarrow.Table.from_pydict(columns, schema=schema)
+        if section not in self.writers:
+            path = os.path.join(self.work_dir, f"{section}.parquet")
+            self.writers[section] = self.pyarrow.parquet.ParquetWriter(path, schema, compression='zstd')
+            self.paths.append(path)
+        self.writers[section].write_table(table)
+        for values in columns.values():
+            values.clear()
+
+    def schema(self, section):
+        types = {'int': self.pyarrow.int64(), 'str': self.pyarrow.string()}
+        return self.pyarrow.schema([(name, types[kind]) for name, kind in SECTION_COLUMNS[section]])
+
+    def finish_sections(self):
+        for section in list(self.buffers):
+            self.flush(section)
+        for writer in self.writers.values():
+            writer.close()
+        return self.paths
+
+
+FORMATS = {
+    'ndjson': lambda export_dir: NDJSONExporter(None, export_dir),
+    'ndjson.gz': lambda export_dir: NDJSONExporter('gzip', export_dir),
+    'ndjson.zst': lambda export_dir: NDJSONExporter('zstd', export_dir),
+    'csv': CSVExporter,
+    'parquet': ParquetExporter,
+}
+
+
+def create_exporter(export_format, export_dir=None):
+    """
+    Returns a new exporter for the given format name.
+    Raises ValueError for unknown formats or missing optional packages.
+    """
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}. Choose one of: {', '.join(FORMATS)}")
+    prune_exports(export_dir)
+    return FORMATS[export_format](export_dir)
+
+
+def prune_exports(export_dir=None, max_age=EXPORT_RETENTION):
+    """
+    Deletes exports, partial files and work directories not modified for
+    `max_age` seconds. Anything else in the directory is left alone.
+    Returns how many entries were removed.
+    """
+    export_dir = export_dir or EXPORT_DIR
+    if not os.path.isdir(export_dir):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in os.listdir(export_dir):
+        if not EXPORT_ENTRY.match(name):
+            continue
+        path = os.path.join(export_dir, name)
+        try:
+            if _last_modified(path) >= cutoff:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            removed += 1
+        except OSError:
+            # Removed by another worker meanwhile
+            continue
+    return removed
+
+
+def _last_modified(path):
+    # A work directory is in use as long as any file in it is being written
+    if not os.path.isdir(path):
+        return os.path.getmtime(path)
+    return max(
+        [os.path.getmtime(path)] +
+        [os.path.getmtime(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names]
+    )
+
+
+def find_export(export_id, export_dir=None):
+    """
+    Returns the path of a finished export, or None.
+    """
+    if not EXPORT_ID.match(export_id or ''):
+        return None
+    export_dir = export_dir or EXPORT_DIR
+    if not os.path.isdir(export_dir):
+        return None
+    for name in os.listdir(export_dir):
+        if not EXPORT_ENTRY.match(name):
+            continue
+        path = os.path.join(export_dir, name)
+        if name.startswith(export_id + '.') and os.path.isfile(path):
+            return path
+    return None
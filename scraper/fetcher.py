@@ -1,14 +1,64 @@
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from requests.structures import CaseInsensitiveDict
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
 import random
 import time
 
+from . import qos
+from .http_client import get_client
+from .singleflight import CoalesceTimeout, get_group
+from .utils import canonical_url
+
+# Statuses worth retrying later; anything else is a permanent failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class FetchError(Exception):
+    """
+    Raised by Fetcher.get when a single attempt fails.
+    `retryable` tells the caller whether trying again later makes sense.
+    """
+
+    def __init__(self, url, message, retryable=False, retry_after=None, status=None):
+        super().__init__(message)
+        self.url = url
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.status = status
+
+class SharedResponse:
+    """
+    Immutable snapshot of a downloaded response (status, headers, body)
+    handed to every caller of a coalesced fetch. Each caller builds its own
+    requests.Response from it, so none can change what the others see.
+    """
+
+    def __init__(self, response):
+        self.url = response.url
+        self.status_code = response.status_code
+        self.reason = response.reason
+        self.headers = tuple(response.headers.items())
+        self.encoding = response.encoding
+        self.content = response.content
+        self.elapsed = response.elapsed
+
+    def response(self):
+        response = requests.Response()
+        response.url = self.url
+        response.status_code = self.status_code
+        response.reason = self.reason
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = self.encoding
+        response.elapsed = self.elapsed
+        # Body already read; requests keeps it here
+        response._content = self.content
+        return response
+
 class Fetcher:
     """
     Handles HTTP requests with proper headers, timeouts, and retries.
     """
-    
+
     USER_AGENTS = [
         'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
         'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -16,19 +66,20 @@ class Fetcher:
         'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
     ]
 
-    def __init__(self, timeout=10, retries=3):
+    MAX_BACKOFF = 60
+
+    def __init__(self, timeout=10, retries=3, backoff_factor=1, client=None):
         self.timeout = timeout
-        self.session = requests.Session()
-        
-        # Configure retries
-        retry_strategy = Retry(
-            total=retries,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+
+        # Every Fetcher shares the process-wide pooled client so keep-alive
+        # connections and DNS lookups survive across API calls, but keeps its
+        # own session so cookies stay with the engine that received them.
+        # Retries are driven by the caller (see fetch / ScraperEngine), never
+        # by the pool.
+        self.client = client or get_client()
+        self.session = self.client.new_session()
 
     def get_random_headers(self):
         return {
@@ -38,19 +89,124 @@ class Fetcher:
             'Connection': 'keep-alive',
         }
 
-    def fetch(self, url):
+    def get(self, url, timeout=None, headers=None, stream=False):
         """
-        Fetches the content of a URL.
-        Returns the response object or None if failed.
+        Makes a single attempt to fetch a URL.
+        `headers` are added to the default ones (e.g. conditional GET validators).
+        Concurrent identical requests from any Fetcher share one download,
+        unless this Fetcher holds cookies, which are never shared. A caller
+        waiting on someone else's download waits no longer than its own
+        timeout, and gets its own response object.
+        Returns the response object or raises FetchError.
         """
+        if stream:
+            # A streamed body can only be read once, so it is never shared
+            return self._get(url, timeout, headers, stream)
+        timeout = self.request_timeout(timeout)
+        owner = id(self.session) if self.session.cookies else None
+        key = (canonical_url(url), tuple(sorted((headers or {}).items())), owner)
         try:
-            response = self.session.get(
-                url, 
-                headers=self.get_random_headers(), 
-                timeout=self.timeout
+            shared = get_group('fetch').do(
+                key, self._get_shared, url, timeout, headers,
+                deadline=time.monotonic() + timeout
             )
-            response.raise_for_status()
-            return response
+        except CoalesceTimeout as e:
+            raise FetchError(url, str(e), retryable=True)
+        return shared.response()
+
+    def request_timeout(self, timeout=None):
+        """
+        Seconds a request may take: `timeout` (default self.timeout), cut
+        to what is left of the current lane's deadline (see qos).
+        """
+        timeout = timeout or self.timeout
+        remaining = qos.remaining()
+        if remaining is not None:
+            timeout = max(0.1, min(timeout, remaining))
+        return timeout
+
+    def _get_shared(self, url, timeout, headers):
+        return SharedResponse(self._get(url, timeout, headers, stream=False))
+
+    def _get(self, url, timeout, headers, stream):
+        request_headers = self.get_random_headers()
+        if headers:
+            request_headers.update(headers)
+        timeout = self.request_timeout(timeout)
+        try:
+            # Outbound connections are shared by lanes; bulk crawls queue
+            # behind interactive calls (see qos)
+            with qos.slot('fetch'):
+                response = self.client.get(
+                    url,
+                    session=self.session,
+                    headers=request_headers,
+                    timeout=timeout,
+                    stream=stream
+                )
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise FetchError(url, str(e), retryable=True)
         except requests.exceptions.RequestException as e:
-            print(f"Error fetching {url}: {e}")
+            raise FetchError(url, str(e))
+
+        if response.status_code in RETRY_STATUSES:
+            response.close()
+            raise FetchError(
+                url,
+                f"{response.status_code} Error for url: {url}",
+                retryable=True,
+                retry_after=self.parse_retry_after(response.headers.get('Retry-After')),
+                status=response.status_code
+            )
+
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            response.close()
+            raise FetchError(url, str(e), status=response.status_code)
+        return response
+
+    def fetch(self, url):
+        """
+        Fetches the content of a URL, retrying transient failures with backoff.
+        Returns the response object or None if failed.
+        """
+        attempt = 0
+        while True:
+            try:
+                return self.get(url)
+            except FetchError as e:
+                attempt += 1
+                delay = self.backoff(attempt, e.retry_after)
+                remaining = qos.remaining()
+                if not e.retryable or attempt > self.retries or (remaining is not None and delay >= remaining):
+                    print(f"Error fetching {url}: {e}")
+                    return None
+                time.sleep(delay)
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Seconds to wait before retry number `attempt` (1-based).
+        A server supplied Retry-After wins over exponential backoff.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.MAX_BACKOFF)
+        return min(self.backoff_factor * (2 ** (attempt - 1)), self.MAX_BACKOFF)
+
+    @staticmethod
+    def parse_retry_after(value):
+        """
+        Parses a Retry-After header (seconds or HTTP date) into seconds.
+        """
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
             return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
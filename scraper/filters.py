@@ -1,4 +1,8 @@
 from .utils import normalize_url, get_domain
+from .parser import Parser
+from .tables import extract_tables
+from .images import ImageProber, MIN_IMAGE_SIZE
+from . import qos
 
 class ContentFilter:
     """
@@ -15,10 +19,20 @@ class ContentFilter:
         - tables
         - links
         - images
+        and optionally:
+        - table_format: 'rows' (default) or 'columns'
+        - table_types: infer numeric/date column types
+        - probe_images: read real image dimensions from the first bytes
+          of each image and drop icons and tracking pixels
         """
         self.config = config
+        self.prober = ImageProber() if config.get('probe_images') else None
 
-    def extract(self, soup, url=None):
+    def extract(self, soup, url=None, template=None):
+        """
+        template: optional TemplateIndex; paragraphs and links it knows
+        to be site-wide boilerplate are left out.
+        """
         if not soup:
             return {}
 
@@ -76,65 +90,18 @@ class ContentFilter:
                 text = p.get_text(" ", strip=True)
                 # Filter out empty or very short paragraphs (likely UI elements)
                 if text and len(text) > 20:
+                    if template and template.is_boilerplate_text(text):
+                        continue
                     paragraphs.append(text)
             data['paragraphs'] = paragraphs
 
 
         if self.config.get('tables'):
-            tables = []
-            for table in soup.find_all('table'):
-                # Skip nested tables for cleaner output
-                if table.find_parent('table'):
-                    continue
-                    
-                table_data = {'headers': [], 'rows': []}
-                
-                # improved header extraction
-                headers = []
-                thead = table.find('thead')
-                if thead:
-                    headers = [th.get_text(" ", strip=True) for th in thead.find_all(['th', 'td'])]
-                
-                # If no thead, check first tr
-                if not headers:
-                    first_tr = table.find('tr')
-                    if first_tr and (first_tr.find_all('th') or len(table.find_all('tr')) > 1):
-                        # Treat first row as header if it has th or if table has multiple rows
-                        headers = [cell.get_text(" ", strip=True) for cell in first_tr.find_all(['th', 'td'])]
-                        # If we used the first row as header, we shouldn't process it as a body row (unless it was in thead)
-                        # We'll handle this by iterating rows carefully below
-                
-                table_data['headers'] = headers
-                
-                # Extract rows
-                rows = []
-                # Get all trs
-                all_trs = table.find_all('tr')
-                
-                # If we identified headers from the first tr and it wasn't in a thead, skip it in rows
-                start_index = 0
-                if headers and not thead and all_trs and all_trs[0].find_all(['th', 'td']):
-                     # Check if the text matches the headers we extracted
-                     first_row_text = [c.get_text(" ", strip=True) for c in all_trs[0].find_all(['th', 'td'])]
-                     if first_row_text == headers:
-                         start_index = 1
-
-                for tr in all_trs[start_index:]:
-                    # Skip if inside thead (already processed)
-                    if tr.find_parent('thead'):
-                        continue
-                        
-                    cells = [td.get_text(" ", strip=True) for td in tr.find_all(['td', 'th'])]
-                    # Filter empty rows
-                    if any(c for c in cells if c):
-                        rows.append(cells)
-                
-                table_data['rows'] = rows
-                
-                # Quality check: only add tables with actual data
-                if rows or (headers and len(headers) > 1):
-                    tables.append(table_data)
-            data['tables'] = tables
+            data['tables'] = extract_tables(
+                soup,
+                columns=self.config.get('table_format') == 'columns',
+                infer_types=bool(self.config.get('table_types'))
+            )
 
         if self.config.get('links'):
             # Extract link text, href, and categorize by context
@@ -156,16 +123,12 @@ class ContentFilter:
                     continue
                     
                 seen_links.add(href)
+
+                if template and template.is_boilerplate_link(href, text):
+                    continue
                 
                 # Determine Context
-                context = 'content'
-                parent_tags = [p.name for p in a.parents]
-                if 'nav' in parent_tags or 'header' in parent_tags:
-                    context = 'nav'
-                elif 'footer' in parent_tags:
-                    context = 'footer'
-                elif 'aside' in parent_tags or 'div' in parent_tags and any(cls in (a.find_parent('div').get('class') or []) for cls in ['sidebar', 'menu', 'widget']):
-                    context = 'sidebar'
+                context = Parser.link_context(a)
                 
                 link_type = 'external'
                 if href.startswith('/') or (self.config.get('domain') and self.config['domain'] in href) or (url and get_domain(url) == get_domain(href)):
@@ -245,6 +208,28 @@ class ContentFilter:
                     'width': width,
                     'height': height
                 })
+
+            if self.prober and images:
+                images = self.probe_images(images)
             data['images'] = images
 
         return data
+
+    def probe_images(self, images):
+        """
+        Fills in real dimensions and format from probed image headers and
+        drops images that turn out to be smaller than MIN_IMAGE_SIZE.
+        Images that could not be probed are kept as they are.
+        """
+        # Waiting on the network; let other pages parse meanwhile
+        with qos.released('cpu'):
+            probed = self.prober.probe_many(image['src'] for image in images)
+        kept = []
+        for image in images:
+            size = probed.get(image['src'])
+            if size:
+                if size['width'] < MIN_IMAGE_SIZE or size['height'] < MIN_IMAGE_SIZE:
+                    continue
+                image = dict(image, width=str(size['width']), height=str(size['height']), format=size['format'])
+            kept.append(image)
+        return kept
@@ -0,0 +1,218 @@
+import heapq
+import itertools
+import re
+import time
+from urllib.parse import urlparse
+
+
+class LinkScorer:
+    """
+    Scores candidate links so the most useful pages are crawled first.
+    Combines DOM context, anchor text, URL depth/pattern and novelty.
+    """
+
+    DEFAULT_WEIGHTS = {
+        'context': 1.0,
+        'anchor': 1.0,
+        'depth': 0.5,
+        'pattern': 1.5,
+        'novelty': 1.0,
+    }
+
+    CONTEXT_SCORES = {'content': 1.0, 'sidebar': 0.4, 'nav': 0.3, 'footer': 0.1}
+
+    LOW_VALUE_WORDS = {
+        'login', 'log in', 'sign in', 'sign up', 'register', 'privacy', 'terms', 'cookie',
+        'legal', 'disclaimer', 'contact', 'careers', 'sitemap', 'subscribe', 'cart', 'account'
+    }
+
+    LOW_VALUE_PATTERN = re.compile(
+        r'/(login|signin|signup|register|privacy|terms|cookies?|legal|disclaimer|tags?|'
+        r'category|author|feed|search|cart|checkout|account|wp-admin)(/|$)'
+        r'|\.(pdf|jpe?g|png|gif|svg|zip|xml|css|js)$',
+        re.IGNORECASE
+    )
+
+    def __init__(self, weights=None):
+        self.weights = dict(self.DEFAULT_WEIGHTS)
+        for key, value in (weights or {}).items():
+            if key in self.weights:
+                self.weights[key] = float(value)
+
+    def score(self, candidate, frontier):
+        """
+        Returns a score in [0, 1] for a candidate dict with url, text and context.
+        """
+        parsed = urlparse(candidate['url'])
+        parts = {
+            'context': self.CONTEXT_SCORES.get(candidate.get('context'), 1.0),
+            'anchor': self.anchor_score(candidate.get('text') or ''),
+            'depth': self.depth_score(parsed.path),
+            'pattern': self.pattern_score(parsed),
+            'novelty': 1.0 / (1 + frontier.section_count(candidate['url'])),
+        }
+
+        total_weight = sum(self.weights.values())
+        if total_weight <= 0:
+            return 0.0
+        return sum(self.weights[k] * parts[k] for k in parts) / total_weight
+
+    def anchor_score(self, text):
+        lower_text = text.lower()
+        if any(word in lower_text for word in self.LOW_VALUE_WORDS):
+            return 0.1
+
+        words = len(text.split())
+        if words == 0:
+            return 0.2
+        if words == 1:
+            return 0.5
+        if words <= 8:
+            return 1.0
+        return 0.8
+
+    def depth_score(self, path):
+        depth = len([p for p in path.split('/') if p])
+        return 1.0 / (1 + 0.25 * max(0, depth - 1))
+
+    def pattern_score(self, parsed):
+        if self.LOW_VALUE_PATTERN.search(parsed.path):
+            return 0.0
+        # Heavily parameterized URLs are usually filters/sort orders of the same content
+        if parsed.query.count('&') >= 2:
+            return 0.5
+        return 1.0
+
+
+class BreadthFirstScorer:
+    """
+    Gives every link the same score, so the frontier expands in discovery order.
+    """
+
+    def __init__(self, weights=None):
+        pass
+
+    def score(self, candidate, frontier):
+        return 0.0
+
+
+SCORERS = {
+    'best_first': LinkScorer,
+    'bfs': BreadthFirstScorer,
+}
+
+
+def register_scorer(name, scorer_class):
+    """
+    Registers a custom scorer class. It is constructed with `weights` and
+    must provide score(candidate, frontier).
+    """
+    SCORERS[name] = scorer_class
+
+
+def build_scorer(config):
+    """
+    Builds a scorer from the `frontier` config: {'strategy': ..., 'weights': {...}}.
+    """
+    config = config or {}
+    strategy = config.get('strategy') or 'best_first'
+    if strategy not in SCORERS:
+        raise ValueError(f"Unknown link strategy: {strategy}")
+    return SCORERS[strategy](config.get('weights'))
+
+
+class Frontier:
+    """
+    Priority queue of URLs to crawl. Highest score is expanded first,
+    ties are broken by discovery order. URLs re-queued with a not-before
+    time (retries) wait in a separate heap until they are due.
+    """
+
+    def __init__(self, scorer=None):
+        self.scorer = scorer or LinkScorer()
+        self.heap = []
+        self.delayed = []
+        self.seen = set()
+        self.sections = {}
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.heap) + len(self.delayed)
+
+    def __contains__(self, url):
+        return url in self.seen
+
+    def section_count(self, url):
+        return self.sections.get(self._section(url), 0)
+
+    def push(self, url, depth, score=1.0):
+        """
+        Adds a URL unless it was already scheduled. Returns True if added.
+        """
+        if url in self.seen:
+            return False
+        self.seen.add(url)
+        section = self._section(url)
+        self.sections[section] = self.sections.get(section, 0) + 1
+        heapq.heappush(self.heap, (-score, next(self.counter), url, depth))
+        return True
+
+    def offer(self, candidates, depth, limit):
+        """
+        Scores candidates found on a page and schedules the best `limit` of them.
+        """
+        scored = []
+        for candidate in candidates:
+            if candidate['url'] in self.seen:
+                continue
+            scored.append((self.scorer.score(candidate, self), len(scored), candidate['url']))
+
+        # Stable sort keeps document order for equal scores
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        added = 0
+        for score, _, url in scored:
+            if added >= limit:
+                break
+            if self.push(url, depth, score):
+                added += 1
+        return added
+
+    def defer(self, url, depth, score, not_before):
+        """
+        Re-queues an already scheduled URL that must not be fetched before
+        `not_before` (a time.monotonic() value).
+        """
+        heapq.heappush(self.delayed, (not_before, next(self.counter), -score, url, depth))
+
+    def ready(self, now=None):
+        """
+        Returns True if a URL can be popped right now.
+        """
+        self._release(now)
+        return bool(self.heap)
+
+    def next_ready_at(self):
+        """
+        Returns the monotonic time the earliest deferred URL becomes due, or None.
+        """
+        return self.delayed[0][0] if self.delayed else None
+
+    def pop(self, now=None):
+        """
+        Returns (url, depth, score) of the best URL that is due.
+        """
+        self._release(now)
+        neg_score, _, url, depth = heapq.heappop(self.heap)
+        return url, depth, -neg_score
+
+    def _release(self, now=None):
+        now = time.monotonic() if now is None else now
+        while self.delayed and self.delayed[0][0] <= now:
+            _, seq, neg_score, url, depth = heapq.heappop(self.delayed)
+            heapq.heappush(self.heap, (neg_score, seq, url, depth))
+
+    @staticmethod
+    def _section(url):
+        path = urlparse(url).path
+        parts = [p for p in path.split('/') if p]
+        return parts[0] if parts else ''
@@ -0,0 +1,333 @@
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import PoolManager
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool, port_by_scheme
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+
+class DNSCache:
+    """
+    In-process DNS cache with a fixed TTL, shared by every pooled connection.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, host, port):
+        """
+        Returns the IP addresses for host:port in resolver order, resolving
+        only when the cached entry expired.
+        """
+        key = (host, port)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+
+        infos = socket.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        with self.lock:
+            self.misses += 1
+            self.entries[key] = (now + self.ttl, addresses)
+        return addresses
+
+    def invalidate(self, host, port):
+        with self.lock:
+            self.entries.pop((host, port), None)
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries)}
+
+
+DNS_CACHE = DNSCache()
+
+# Seconds a background prewarm may spend connecting
+PREWARM_TIMEOUT = 5
+# Seconds after which a prewarmed origin may be warmed again; servers
+# close idle keep-alive connections well within this
+PREWARM_TTL = 60
+
+
+class ConnectionStats:
+    """
+    Thread-safe counters for requests sent vs. connections actually opened.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def request(self):
+        with self.lock:
+            self.requests += 1
+
+    def connection(self):
+        with self.lock:
+            self.connections += 1
+
+    def snapshot(self):
+        with self.lock:
+            requests_sent, opened = self.requests, self.connections
+        return {
+            'requests': requests_sent,
+            'connections_opened': opened,
+            'connections_reused': max(0, requests_sent - opened),
+            'reuse_ratio': round(1 - opened / requests_sent, 3) if requests_sent else 0.0,
+        }
+
+
+CONNECTION_STATS = ConnectionStats()
+
+
+class _CachedDNSMixin:
+    # urllib3 connects to `_dns_host`; swap in each cached address for the
+    # socket only, so TLS still verifies against the real host name. Like
+    # socket.create_connection, fall back to the next address when one
+    # fails (e.g. IPv6 unreachable on a dual-stack host).
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            addresses = DNS_CACHE.resolve(host, self.port)
+        except OSError:
+            # Let urllib3 raise its own name resolution error
+            addresses = [host]
+        try:
+            for index, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except (NewConnectionError, ConnectTimeoutError):
+                    if index == len(addresses) - 1:
+                        raise
+        except Exception:
+            DNS_CACHE.invalidate(host, self.port)
+            raise
+        finally:
+            self._dns_host = host
+        CONNECTION_STATS.connection()
+        return sock
+
+
+class _CachedHTTPConnection(_CachedDNSMixin, HTTPConnection):
+    pass
+
+
+class _CachedHTTPSConnection(_CachedDNSMixin, HTTPSConnection):
+    pass
+
+
+class _CachedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CachedHTTPConnection
+
+
+class _CachedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedHTTPSConnection
+
+
+class _SizedPoolManager(PoolManager):
+    """
+    PoolManager that creates the pool for an origin with the size recorded
+    for it in `pool_sizes` (see HttpClient.ensure_pool_size), if any. Pools
+    are still bounded by num_pools and evicted least recently used first.
+    """
+
+    def __init__(self, pool_sizes, **kwargs):
+        super().__init__(**kwargs)
+        self.pool_sizes = pool_sizes
+        self.pool_classes_by_scheme = {
+            'http': _CachedHTTPConnectionPool,
+            'https': _CachedHTTPSConnectionPool,
+        }
+
+    def connection_from_host(self, host, port=None, scheme='http', pool_kwargs=None):
+        scheme = (scheme or 'http').lower()
+        key = (scheme, (host or '').lower(), port or port_by_scheme.get(scheme, 80))
+        maxsize = self.pool_sizes.get(key)
+        if maxsize is not None:
+            pool_kwargs = dict(pool_kwargs or {}, maxsize=maxsize)
+        return super().connection_from_host(host, port, scheme, pool_kwargs)
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connections resolve through the shared DNS cache and
+    whose per-origin pool sizes come from `pool_sizes`.
+    """
+
+    def __init__(self, pool_sizes=None, **kwargs):
+        # Set first: HTTPAdapter.__init__ calls init_poolmanager
+        self.pool_sizes = {} if pool_sizes is None else pool_sizes
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _SizedPoolManager(
+            self.pool_sizes,
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            **pool_kwargs
+        )
+
+
+class HttpClient:
+    """
+    Process-wide HTTP client. Every Fetcher gets its own session (and so
+    its own cookie jar) mounted on one shared adapter, so keep-alive pools
+    are shared while cookies never cross engines. Adds per-host pool sizing,
+    DNS caching and connection prewarming.
+    """
+
+    def __init__(self, pool_connections=32, pool_maxsize=10):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+
+        # Origin -> pool size; read by the adapter's pool manager, written
+        # under self.lock and capped like the pools themselves
+        self.host_pools = OrderedDict()
+        # Retries are driven by callers (see Fetcher), never inside the pool
+        self.adapter = PooledAdapter(
+            pool_sizes=self.host_pools,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=0
+        )
+
+        # Origin -> monotonic time it was last prewarmed
+        self.warm_hosts = {}
+        self.lock = threading.Lock()
+        self.prewarm_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='prewarm')
+
+    def new_session(self):
+        """
+        Returns a session with its own cookie jar that sends through the
+        shared pools. Do not close it: that would close the shared pools.
+        """
+        session = requests.Session()
+        session.mount("http://", self.adapter)
+        session.mount("https://", self.adapter)
+        return session
+
+    def request(self, method, url, session=None, **kwargs):
+        CONNECTION_STATS.request()
+        if session is None:
+            session = self.new_session()
+        return session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def ensure_pool_size(self, url, maxsize):
+        """
+        Makes sure the pool for the URL's origin keeps at least `maxsize`
+        connections alive, e.g. one per crawl worker. Pools only ever grow
+        while their origin is among the `pool_connections` most recently
+        sized ones; older entries fall back to the default size.
+        """
+        key = self._pool_key(url)
+        if not key:
+            return
+        with self.lock:
+            if key in self.host_pools:
+                self.host_pools.move_to_end(key)
+            if self.host_pools.get(key, self.pool_maxsize) >= maxsize:
+                return
+            self.host_pools[key] = maxsize
+            while len(self.host_pools) > self.pool_connections:
+                self.host_pools.popitem(last=False)
+
+    def prewarm(self, urls):
+        """
+        Resolves DNS and opens a connection in the background for hosts
+        not warmed in the last PREWARM_TTL seconds, so the first real
+        request finds a warm socket. Used for SCRAPER_WARM_URLS at start-up.
+        """
+        for url in urls:
+            origin = self._origin(url)
+            if not origin:
+                continue
+            now = time.monotonic()
+            with self.lock:
+                self._expire_warm_hosts(now)
+                if origin in self.warm_hosts:
+                    continue
+                self.warm_hosts[origin] = now
+            self.prewarm_executor.submit(self._warm, origin)
+
+    def _expire_warm_hosts(self, now):
+        # Must be called with self.lock held
+        for origin, warmed in list(self.warm_hosts.items()):
+            if now - warmed >= PREWARM_TTL:
+                del self.warm_hosts[origin]
+
+    def _warm(self, origin):
+        # A HEAD through a throwaway session leaves a keep-alive connection
+        # in the shared pool; not counted as a request
+        try:
+            self.new_session().head(origin + '/', timeout=PREWARM_TIMEOUT, allow_redirects=False)
+        except Exception as e:
+            print(f"Error prewarming {origin}: {e}")
+
+    def stats(self):
+        stats = CONNECTION_STATS.snapshot()
+        stats['dns'] = DNS_CACHE.stats()
+        with self.lock:
+            self._expire_warm_hosts(time.monotonic())
+            stats['prewarmed_hosts'] = len(self.warm_hosts)
+            stats['host_pools'] = {
+                f"{scheme}://{host}:{port}": size for (scheme, host, port), size in self.host_pools.items()
+            }
+        stats['default_pool_size'] = self.pool_maxsize
+        return stats
+
+    @staticmethod
+    def _origin(url):
+        parsed = urlparse(url)
+        if not parsed.scheme or not parsed.netloc:
+            return None
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    @staticmethod
+    def _pool_key(url):
+        # Same (scheme, host, port) key _SizedPoolManager looks pools up by
+        parsed = urlparse(url)
+        scheme = parsed.scheme.lower()
+        if scheme not in port_by_scheme or not parsed.hostname:
+            return None
+        return (scheme, parsed.hostname.lower(), parsed.port or port_by_scheme[scheme])
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the process-wide HttpClient, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient()
+    return _client
@@ -0,0 +1,236 @@
+import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+
+from .fetcher import Fetcher, FetchError
+from .singleflight import CoalesceTimeout, get_group
+
+# Header bytes requested per image; enough for PNG/GIF/BMP/WebP and the
+# SOF segment of nearly all JPEGs
+PROBE_BYTES = 16384
+
+# Probed images narrower or shorter than this (pixels) are dropped as icons/trackers
+MIN_IMAGE_SIZE = 32
+
+# At most this many probes run at once across all crawls
+MAX_CONCURRENT_PROBES = 8
+
+# At most this many probes are queued or running at once across all crawls;
+# past that, a page's remaining images are left unprobed
+MAX_QUEUED_PROBES = 64
+
+JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def image_size(data):
+    """
+    Reads (format, width, height) from the first bytes of an image file.
+    Returns None if the format is unknown or the header is incomplete.
+    """
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        width, height = struct.unpack('>II', data[16:24])
+        return 'png', width, height
+
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        width, height = struct.unpack('<HH', data[6:10])
+        return 'gif', width, height
+
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP' and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b'VP8 ':
+            width, height = struct.unpack('<HH', data[26:30])
+            return 'webp', width & 0x3fff, height & 0x3fff
+        if chunk == b'VP8L':
+            bits = int.from_bytes(data[21:25], 'little')
+            return 'webp', (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+        if chunk == b'VP8X':
+            width = int.from_bytes(data[24:27], 'little') + 1
+            height = int.from_bytes(data[27:30], 'little') + 1
+            return 'webp', width, height
+        return None
+
+    if data[:2] == b'BM' and len(data) >= 26:
+        header_size = struct.unpack('<I', data[14:18])[0]
+        if header_size == 12:
+            width, height = struct.unpack('<HH', data[18:22])
+        else:
+            width, height = struct.unpack('<ii', data[18:26])
+        return 'bmp', abs(width), abs(height)
+
+    if data[:2] == b'\xff\xd8':
+        return _jpeg_size(data)
+
+    return None
+
+
+def _jpeg_size(data):
+    position = 2
+    while position + 9 < len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:
+            # Fill byte
+            position += 1
+            continue
+        if marker in JPEG_SOF:
+            height, width = struct.unpack('>HH', data[position + 5:position + 9])
+            return 'jpeg', width, height
+        if marker == 0xD8 or 0xD0 <= marker <= 0xD7:
+            position += 2
+            continue
+        length = struct.unpack('>H', data[position + 2:position + 4])[0]
+        position += 2 + length
+    return None
+
+
+class ProbeCache:
+    """
+    LRU of probe results by image URL, shared by every prober in the process.
+    Failed probes are cached too (as None) so they are not retried per page.
+    """
+
+    def __init__(self, max_entries=20000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        with self.lock:
+            if url not in self.entries:
+                return False, None
+            self.entries.move_to_end(url)
+            return True, self.entries[url]
+
+    def put(self, url, result):
+        with self.lock:
+            self.entries[url] = result
+            self.entries.move_to_end(url)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+PROBE_CACHE = ProbeCache()
+
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PROBES, thread_name_prefix='probe')
+_queue_slots = threading.BoundedSemaphore(MAX_QUEUED_PROBES)
+
+
+class ImageProber:
+    """
+    Finds real image dimensions by fetching only the first PROBE_BYTES of
+    each image with a Range request over the shared HTTP pool.
+    """
+
+    def __init__(self, fetcher=None, probe_bytes=PROBE_BYTES, timeout=5, max_per_page=50):
+        self.fetcher = fetcher or Fetcher()
+        self.probe_bytes = probe_bytes
+        self.timeout = timeout
+        self.max_per_page = max_per_page
+        self.lock = threading.Lock()
+        self.pages = 0
+        self.probed = 0
+        self.cache_hits = 0
+        self.failures = 0
+        self.skipped = 0
+        self.cancelled = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def probe(self, url):
+        """
+        Returns {'format', 'width', 'height'} for an image URL, or None.
+        """
+        cached, result = PROBE_CACHE.get(url)
+        if cached:
+            with self.lock:
+                self.cache_hits += 1
+            return result
+        # Pages of one site share logos and icons; probe each only once
+        try:
+            return get_group('probe').do(url, self._probe, url, deadline=time.monotonic() + self.timeout)
+        except CoalesceTimeout as e:
+            print(f"Error probing image {url}: {e}")
+            return None
+
+    def _probe(self, url):
+        data = bytearray()
+        cacheable = True
+        try:
+            response = self.fetcher.get(
+                url,
+                timeout=self.timeout,
+                headers={'Range': f'bytes=0-{self.probe_bytes - 1}', 'Accept': 'image/*'},
+                stream=True
+            )
+            try:
+                # Servers that ignore Range send the whole file; stop reading early
+                for chunk in response.iter_content(chunk_size=4096):
+                    data += chunk
+                    if image_size(data) or len(data) >= self.probe_bytes:
+                        break
+            finally:
+                response.close()
+        except FetchError as e:
+            # Transient errors are not remembered; the next page may try again
+            cacheable = not e.retryable
+            print(f"Error probing image {url}: {e}")
+        except (requests.exceptions.RequestException, OSError) as e:
+            cacheable = False
+            print(f"Error probing image {url}: {e}")
+
+        size = image_size(data)
+        result = {'format': size[0], 'width': size[1], 'height': size[2]} if size else None
+        if result or cacheable:
+            PROBE_CACHE.put(url, result)
+        with self.lock:
+            self.probed += 1
+            self.bytes += len(data)
+            if result is None:
+                self.failures += 1
+        return result
+
+    def probe_many(self, urls):
+        """
+        Probes up to `max_per_page` URLs concurrently. Returns {url: result};
+        URLs that were not probed (probe queue full) or timed out are missing.
+        """
+        started = time.monotonic()
+        futures = {}
+        skipped = 0
+        for url in list(dict.fromkeys(urls))[:self.max_per_page]:
+            # Never let slow pages pile up probes behind the shared executor
+            if not _queue_slots.acquire(blocking=False):
+                skipped += 1
+                continue
+            future = _executor.submit(self.probe, url)
+            future.add_done_callback(lambda _: _queue_slots.release())
+            futures[future] = url
+        done, not_done = wait(futures, timeout=self.timeout)
+        # Probes that have not started yet are dropped; running ones finish
+        # and still fill the cache for later pages
+        cancelled = sum(1 for future in not_done if future.cancel())
+        results = {futures[future]: future.result() for future in done if not future.exception()}
+        with self.lock:
+            self.pages += 1
+            self.skipped += skipped
+            self.cancelled += cancelled
+            self.seconds += time.monotonic() - started
+        return results
+
+    def stats(self):
+        with self.lock:
+            return {
+                'pages': self.pages,
+                'probed': self.probed,
+                'cache_hits': self.cache_hits,
+                'failures': self.failures,
+                'skipped': self.skipped,
+                'cancelled': self.cancelled,
+                'bytes': self.bytes,
+                'ms_per_page': round(self.seconds * 1000 / self.pages, 2) if self.pages else 0.0,
+            }
@@ -0,0 +1,290 @@
+import heapq
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from .qos import INTERACTIVE, QueueTimeout, current_lane, remaining
+
+# Parsed trees take roughly this many bytes per byte of HTML (10-50x is
+# typical for BeautifulSoup); used to size a page's share of the budget
+TREE_FACTOR = 20
+
+# In-flight parse memory per process before parsing is throttled
+MEMORY_BUDGET = int(os.environ.get('SCRAPER_MEMORY_BUDGET_MB', 512)) * 1024 * 1024
+
+# Heaviest pages kept in MemoryStats reports
+TOP_PAGES = 5
+
+# Held by the one PageMemory being traced (see PageMemory)
+_tracing = threading.Lock()
+
+
+class MemoryBudget:
+    """
+    Caps the estimated memory of pages being processed at once. A page
+    that would push the total over the limit waits until others are
+    released, so heavy pages lower parse concurrency instead of exhausting
+    memory. With nothing in flight a page is admitted however large.
+
+    Interactive reservations and growing ones (resize) have priority: while
+    one waits, no new bulk reservation is admitted, so a summary is not
+    starved by a stream of crawl pages that each fit.
+    """
+
+    def __init__(self, limit=MEMORY_BUDGET):
+        self.limit = limit
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.pages = 0
+        self.peak = 0
+        self.throttled = 0
+        self.waiting = 0
+        self.priority_waiting = 0
+        self.wait_seconds = 0.0
+
+    def reserve(self, nbytes):
+        """
+        Blocks until `nbytes` fit in the budget. Raises QueueTimeout if the
+        current lane's deadline (see qos) passes first.
+        """
+        with self.cond:
+            self._wait_for(nbytes, priority=current_lane() == INTERACTIVE)
+            self.pages += 1
+
+    def resize(self, old, new):
+        """
+        Changes an existing reservation from `old` to `new` bytes, waiting
+        for room if it grows. The work is already admitted, so it waits
+        ahead of new bulk reservations. Callers must not hold other shared
+        slots while this waits; see qos.released.
+        """
+        with self.cond:
+            self.in_flight -= old
+            self.cond.notify_all()
+            try:
+                self._wait_for(new, priority=True)
+            except QueueTimeout:
+                self.in_flight += old
+                raise
+
+    def release(self, nbytes):
+        with self.cond:
+            self.in_flight -= nbytes
+            self.pages -= 1
+            self.cond.notify_all()
+
+    def _admissible(self, nbytes, priority):
+        # Nothing in flight means even an oversized page goes ahead, so
+        # waiting always ends
+        if not priority and self.priority_waiting:
+            return False
+        return not self.in_flight or self.in_flight + nbytes <= self.limit
+
+    def _wait_for(self, nbytes, priority):
+        # Must hold self.cond
+        if not self._admissible(nbytes, priority):
+            left = remaining()
+            deadline = None if left is None else time.monotonic() + left
+            started = time.monotonic()
+            self.throttled += 1
+            self.waiting += 1
+            if priority:
+                self.priority_waiting += 1
+            try:
+                while not self._admissible(nbytes, priority):
+                    timeout = None if deadline is None else deadline - time.monotonic()
+                    if timeout is not None and timeout <= 0:
+                        raise QueueTimeout("Memory budget exhausted before the deadline")
+                    self.cond.wait(timeout)
+            finally:
+                self.waiting -= 1
+                if priority:
+                    self.priority_waiting -= 1
+                    # Bulk waiters held back by this one re-check
+                    self.cond.notify_all()
+                self.wait_seconds += time.monotonic() - started
+        self.in_flight += nbytes
+        self.peak = max(self.peak, self.in_flight)
+
+    @contextmanager
+    def hold(self, nbytes):
+        """
+        Reserves `nbytes` while the enclosed work runs; yields a Reservation
+        that can be resized as the work moves to another stage.
+        """
+        self.reserve(nbytes)
+        reservation = Reservation(self, nbytes)
+        try:
+            yield reservation
+        finally:
+            self.release(reservation.nbytes)
+
+    def stats(self):
+        with self.cond:
+            return {
+                'limit_mb': round(self.limit / (1024 * 1024), 1),
+                'in_flight_mb': round(self.in_flight / (1024 * 1024), 1),
+                'peak_in_flight_mb': round(self.peak / (1024 * 1024), 1),
+                'pages_in_flight': self.pages,
+                'throttled': self.throttled,
+                'waiting': self.waiting,
+                'priority_waiting': self.priority_waiting,
+                'wait_seconds': round(self.wait_seconds, 3),
+            }
+
+
+class Reservation:
+    """
+    A page's current share of a MemoryBudget.
+    """
+
+    def __init__(self, budget, nbytes):
+        self.budget = budget
+        self.nbytes = nbytes
+
+    def resize(self, nbytes):
+        self.budget.resize(self.nbytes, nbytes)
+        self.nbytes = nbytes
+
+
+def tree_bytes(html_bytes):
+    """
+    Estimated memory of the parsed tree of a page of `html_bytes`.
+    """
+    return html_bytes * TREE_FACTOR
+
+
+class PageMemory:
+    """
+    Memory used by one page, per stage. With tracemalloc running (e.g.
+    PYTHONTRACEMALLOC=1) mark() records, for the stage that just ended, its
+    peak and the bytes still held, both relative to where the page started;
+    otherwise only sizes are kept. tracemalloc's peak is process-wide and
+    mark() resets it, so only one page is traced at a time: pages started
+    meanwhile are counted but not traced. Allocations made by other threads
+    during a traced page still show up in its figures. Use it as a context
+    manager so the next page can be traced once this one is done.
+    """
+
+    def __init__(self, url, html_bytes):
+        self.url = url
+        self.html_bytes = html_bytes
+        self.stages = {}
+        self.base = 0
+        # `tracing`: this page is (or was) traced; `active`: still being traced
+        self.tracing = tracemalloc.is_tracing() and _tracing.acquire(blocking=False)
+        self.active = self.tracing
+        if self.tracing:
+            self.base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+    def mark(self, stage):
+        """
+        Ends `stage` and starts measuring the next one.
+        """
+        if not self.active:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        self.stages[stage] = {'peak': peak - self.base, 'retained': current - self.base}
+        tracemalloc.reset_peak()
+
+    def close(self):
+        if self.active:
+            self.active = False
+            _tracing.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def peak(self):
+        return max((stage['peak'] for stage in self.stages.values()), default=0)
+
+    @property
+    def retained(self):
+        return list(self.stages.values())[-1]['retained'] if self.stages else 0
+
+    def report(self):
+        report = {'url': self.url, 'html_bytes': self.html_bytes}
+        if self.tracing:
+            report['peak_bytes'] = self.peak
+            report['retained_bytes'] = self.retained
+            report['stages'] = self.stages
+        return report
+
+
+class MemoryStats:
+    """
+    Aggregates PageMemory reports: totals per stage and the heaviest pages.
+    """
+
+    def __init__(self, top=TOP_PAGES):
+        self.top = top
+        self.lock = threading.Lock()
+        self.pages = 0
+        self.traced_pages = 0
+        self.html_bytes = 0
+        self.stages = {}
+        self.heaviest = []
+        self.sequence = 0
+
+    def add(self, page):
+        with self.lock:
+            self.pages += 1
+            self.html_bytes += page.html_bytes
+            for name, stage in page.stages.items():
+                totals = self.stages.setdefault(name, {'max_peak': 0, 'total_retained': 0})
+                totals['max_peak'] = max(totals['max_peak'], stage['peak'])
+                totals['total_retained'] += stage['retained']
+            if page.tracing:
+                self.traced_pages += 1
+                self.sequence += 1
+                entry = (page.peak, self.sequence, page.report())
+                if len(self.heaviest) < self.top:
+                    heapq.heappush(self.heaviest, entry)
+                else:
+                    heapq.heappushpop(self.heaviest, entry)
+
+    def stats(self):
+        with self.lock:
+            stats = {
+                'tracing': tracemalloc.is_tracing(),
+                'pages': self.pages,
+                'traced_pages': self.traced_pages,
+                'html_bytes': self.html_bytes,
+            }
+            if self.stages:
+                stats['stages'] = {name: dict(totals) for name, totals in self.stages.items()}
+                stats['heaviest_pages'] = [report for _, _, report in sorted(self.heaviest, reverse=True)]
+            return stats
+
+
+def release_tree(soup):
+    """
+    Tears a parsed tree down right away. Trees are full of parent/child
+    reference cycles, so dropping the last reference alone leaves them to
+    the cyclic garbage collector, which may not run for a while.
+    """
+    if soup is not None and not soup.decomposed:
+        soup.decompose()
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+
+def get_budget():
+    """
+    Returns the process-wide MemoryBudget, creating it on first use.
+    """
+    global _budget
+    if _budget is None:
+        with _budget_lock:
+            if _budget is None:
+                _budget = MemoryBudget()
+    return _budget
@@ -1,23 +1,123 @@
-from bs4 import BeautifulSoup
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Tags each ContentFilter section reads. Sections missing from this map
+# (currently 'links', which inspects ancestors for context) need a full tree.
+SECTION_TAGS = {
+    'title': ['title', 'h1'],
+    'meta_description': ['meta'],
+    'headings': ['h1', 'h2', 'h3'],
+    'paragraphs': ['p'],
+    'tables': ['table'],
+    'images': ['img'],
+}
+
+SECTIONS = set(SECTION_TAGS) | {'links'}
+
+# Sections that can be answered from <head> alone
+HEAD_SECTIONS = {'title', 'meta_description'}
+
+HEAD_END = re.compile(r'</head\s*>', re.IGNORECASE)
+
+# Containers that decide a link's context (see Parser.link_context)
+CONTEXT_TAGS = {'nav', 'header', 'footer', 'aside'}
+SIDEBAR_CLASSES = ['sidebar', 'menu', 'widget']
+
 
 class Parser:
     """
     Parses HTML content using BeautifulSoup and lxml.
     """
-    
+
     @staticmethod
-    def parse(html_content):
+    def parse(html_content, sections=None, follow_links=True):
         """
         Parses raw HTML string into a BeautifulSoup object.
+
+        When `sections` (a ContentFilter config dict) is given, only the parts
+        of the document those sections and link discovery need are built:
+        head-only configs stop at </head>, others keep just the relevant tags.
         """
         if not html_content:
             return None
-        
+
+        if sections is None:
+            return Parser._build(html_content)
+
+        enabled = {name for name in SECTIONS if sections.get(name)}
+
+        if enabled and enabled <= HEAD_SECTIONS and not follow_links:
+            soup = Parser.parse_head(html_content)
+            if soup is not None and Parser._head_satisfies(soup, enabled):
+                return soup
+
+        tags = Parser.strainer_tags(enabled, follow_links)
+        if tags is None:
+            return Parser._build(html_content)
+        if follow_links:
+            # Keep the containers link scoring uses to tell nav/footer links apart
+            return Parser._build(html_content, SoupStrainer(Parser._tag_matcher(tags)))
+        return Parser._build(html_content, SoupStrainer(tags))
+
+    @staticmethod
+    def parse_head(html_content):
+        """
+        Parses only the <head> of the document.
+        Returns None if the document has no closing head tag.
+        """
+        match = HEAD_END.search(html_content)
+        if not match:
+            return None
+        return Parser._build(html_content[:match.end()])
+
+    @staticmethod
+    def strainer_tags(enabled, follow_links=True):
+        """
+        Returns the list of tag names needed for the enabled sections,
+        or None if a full tree is required.
+        """
+        tags = set()
+        for section in enabled:
+            if section not in SECTION_TAGS:
+                return None
+            tags.update(SECTION_TAGS[section])
+        if follow_links:
+            tags.add('a')
+        if not tags:
+            return None
+        return sorted(tags)
+
+    @staticmethod
+    def _head_satisfies(soup, enabled):
+        # The title section falls back to the first <h1>, which lives in <body>
+        if 'title' in enabled:
+            return bool(soup.title and soup.title.get_text(strip=True))
+        return True
+
+    @staticmethod
+    def _tag_matcher(tags):
+        tags = set(tags)
+
+        def matches(name, attrs):
+            if name in tags or name in CONTEXT_TAGS:
+                return True
+            if name == 'div':
+                classes = attrs.get('class') or []
+                if isinstance(classes, str):
+                    classes = classes.split()
+                return any(cls in classes for cls in SIDEBAR_CLASSES)
+            return False
+
+        return matches
+
+    @staticmethod
+    def _build(html_content, parse_only=None):
         try:
-            return BeautifulSoup(html_content, 'lxml')
+            return BeautifulSoup(html_content, 'lxml', parse_only=parse_only)
         except Exception as e:
             # Fallback to html.parser if lxml fails
-            return BeautifulSoup(html_content, 'html.parser')
+            return BeautifulSoup(html_content, 'html.parser', parse_only=parse_only)
 
     @staticmethod
     def extract_links(soup, base_url):
@@ -27,9 +127,41 @@ class Parser:
         links = set()
         if not soup:
             return links
-            
+
         for a_tag in soup.find_all('a', href=True):
             href = a_tag['href']
             links.add(href)
-            
+
         return links
+
+    @staticmethod
+    def link_context(a_tag):
+        """
+        Classifies where a link sits on the page: nav, footer, sidebar or content.
+        """
+        parent_tags = [p.name for p in a_tag.parents]
+        if 'nav' in parent_tags or 'header' in parent_tags:
+            return 'nav'
+        elif 'footer' in parent_tags:
+            return 'footer'
+        elif 'aside' in parent_tags or 'div' in parent_tags and any(cls in (a_tag.find_parent('div').get('class') or []) for cls in SIDEBAR_CLASSES):
+            return 'sidebar'
+        return 'content'
+
+    @staticmethod
+    def extract_link_candidates(soup):
+        """
+        Extracts links with their anchor text and DOM context, in document order.
+        """
+        candidates = []
+        if not soup:
+            return candidates
+
+        for a_tag in soup.find_all('a', href=True):
+            candidates.append({
+                'href': a_tag['href'],
+                'text': a_tag.get_text(" ", strip=True),
+                'context': Parser.link_context(a_tag)
+            })
+
+        return candidates
@@ -0,0 +1,228 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+LANES = (INTERACTIVE, BULK)
+
+# Total time an interactive call may spend, queueing and fetching included,
+# before it gives up. Bulk work (crawls) has its own budgets (max_seconds).
+LANE_DEADLINES = {INTERACTIVE: 10.0, BULK: None}
+
+# Parse/rank slots per process (SCRAPER_CPU_SLOTS). Parsing holds the GIL
+# for most of its time, but page handling also waits on locks and I/O, so
+# scale with the cores a worker may be scheduled on rather than run one
+# page at a time.
+CPU_SLOTS = int(os.environ.get('SCRAPER_CPU_SLOTS', max(4, 2 * (os.cpu_count() or 1))))
+
+# (capacity, reserved) per shared resource. Reserved slots are usable by
+# the interactive lane only; a quarter of the parse/rank slots are kept
+# for summaries.
+RESOURCES = {
+    'fetch': (32, 8),
+    'cpu': (CPU_SLOTS, max(1, CPU_SLOTS // 4)),
+}
+
+# Recent queue waits kept per lane for the percentiles in stats()
+WAIT_SAMPLES = 2048
+
+_current = ContextVar('qos_lane', default=(BULK, None))
+
+
+class QueueTimeout(Exception):
+    """
+    Raised when work could not get a slot before its lane's deadline.
+    """
+
+
+@contextmanager
+def lane(name, deadline=None):
+    """
+    Runs the enclosed work (in this thread) in a lane. `deadline` is in
+    seconds from now and defaults to the lane's LANE_DEADLINES entry.
+    Work outside any lane, e.g. crawl worker threads, is bulk.
+    """
+    if name not in LANES:
+        raise ValueError(f"Unknown lane '{name}'")
+    if deadline is None:
+        deadline = LANE_DEADLINES[name]
+    token = _current.set((name, time.monotonic() + deadline if deadline is not None else None))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current_lane():
+    return _current.get()[0]
+
+
+def remaining():
+    """
+    Seconds left before the current lane's deadline, or None without one.
+    """
+    deadline = _current.get()[1]
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+class LaneScheduler:
+    """
+    Counting semaphore for one resource, shared by the lanes. Interactive
+    work may use every slot; bulk work leaves `reserved` of them free and
+    is not admitted at all while interactive work is queueing, so a freed
+    slot always goes to the interactive lane first.
+    """
+
+    def __init__(self, name, capacity, reserved):
+        if not 0 <= reserved < capacity:
+            raise ValueError("reserved must be at least 0 and less than capacity")
+        self.name = name
+        self.capacity = capacity
+        self.reserved = reserved
+        self.cond = threading.Condition()
+        self.local = threading.local()
+        self.in_use = dict.fromkeys(LANES, 0)
+        self.waiting = dict.fromkeys(LANES, 0)
+        self.admitted = dict.fromkeys(LANES, 0)
+        self.timeouts = dict.fromkeys(LANES, 0)
+        self.waits = {lane_name: deque(maxlen=WAIT_SAMPLES) for lane_name in LANES}
+
+    def acquire(self, lane_name, deadline=None):
+        """
+        Blocks until a slot is free for the lane. Raises QueueTimeout if the
+        monotonic `deadline` passes first.
+        """
+        started = time.monotonic()
+        with self.cond:
+            self.waiting[lane_name] += 1
+            try:
+                while not self._admissible(lane_name):
+                    timeout = None if deadline is None else deadline - time.monotonic()
+                    if timeout is not None and timeout <= 0:
+                        self.timeouts[lane_name] += 1
+                        raise QueueTimeout(f"No {self.name} capacity for {lane_name} work before its deadline")
+                    self.cond.wait(timeout)
+            finally:
+                self.waiting[lane_name] -= 1
+            self.in_use[lane_name] += 1
+            self.admitted[lane_name] += 1
+            self.waits[lane_name].append(time.monotonic() - started)
+
+    def release(self, lane_name):
+        with self.cond:
+            self.in_use[lane_name] -= 1
+            # Every waiter re-checks; bulk ones step back if interactive is queued
+            self.cond.notify_all()
+
+    def _admissible(self, lane_name):
+        used = sum(self.in_use.values())
+        if lane_name == INTERACTIVE:
+            return used < self.capacity
+        return used < self.capacity - self.reserved and not self.waiting[INTERACTIVE]
+
+    @contextmanager
+    def slot(self):
+        """
+        Holds a slot for the current lane while the enclosed work runs.
+        """
+        lane_name, deadline = _current.get()
+        self.acquire(lane_name, deadline)
+        held = self._held()
+        held.append(lane_name)
+        try:
+            yield
+        finally:
+            # None: released() could not take the slot back
+            if held.pop() is not None:
+                self.release(lane_name)
+
+    @contextmanager
+    def released(self):
+        """
+        Gives up this thread's slot while the enclosed code waits on
+        something else (e.g. the network), then takes one again. Raises
+        QueueTimeout if the lane's deadline passes before it gets one.
+        """
+        held = self._held()
+        if not held or held[-1] is None:
+            yield
+            return
+        lane_name = held.pop()
+        self.release(lane_name)
+        try:
+            yield
+        except BaseException:
+            # Leaving anyway; no point in queueing for the slot again
+            held.append(None)
+            raise
+        try:
+            self.acquire(lane_name, _current.get()[1])
+        except QueueTimeout:
+            held.append(None)
+            raise
+        held.append(lane_name)
+
+    def _held(self):
+        if not hasattr(self.local, 'held'):
+            self.local.held = []
+        return self.local.held
+
+    def stats(self):
+        with self.cond:
+            lanes = {}
+            for lane_name in LANES:
+                waits = sorted(self.waits[lane_name])
+                lanes[lane_name] = {
+                    'admitted': self.admitted[lane_name],
+                    'in_use': self.in_use[lane_name],
+                    'waiting': self.waiting[lane_name],
+                    'timeouts': self.timeouts[lane_name],
+                    'wait_p50_ms': _percentile_ms(waits, 50),
+                    'wait_p95_ms': _percentile_ms(waits, 95),
+                    'wait_p99_ms': _percentile_ms(waits, 99),
+                    'wait_max_ms': round(waits[-1] * 1000, 2) if waits else 0.0,
+                }
+            return {'capacity': self.capacity, 'reserved': self.reserved, 'lanes': lanes}
+
+
+def _percentile_ms(ordered, pct):
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return round(ordered[rank - 1] * 1000, 2)
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(resource):
+    """
+    Returns the process-wide LaneScheduler for a resource in RESOURCES.
+    """
+    with _schedulers_lock:
+        if resource not in _schedulers:
+            capacity, reserved = RESOURCES[resource]
+            _schedulers[resource] = LaneScheduler(resource, capacity, reserved)
+        return _schedulers[resource]
+
+
+def slot(resource):
+    return get_scheduler(resource).slot()
+
+
+def released(resource):
+    return get_scheduler(resource).released()
+
+
+def stats():
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {name: scheduler.stats() for name, scheduler in schedulers.items()}
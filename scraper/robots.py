@@ -0,0 +1,82 @@
+import threading
+import time
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from .fetcher import Fetcher, FetchError
+
+
+class RobotsCache:
+    """
+    Fetches and caches robots.txt per origin. Exposes allow/disallow
+    checks, the crawl-delay and the sitemap directives.
+    """
+
+    TTL = 3600
+    # robots.txt that could not be fetched is retried sooner
+    ERROR_TTL = 60
+
+    def __init__(self, fetcher=None, user_agent='*'):
+        self.fetcher = fetcher or Fetcher()
+        self.user_agent = user_agent
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        """
+        Returns the parsed RobotFileParser for the URL's origin.
+        """
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(origin)
+            if entry and entry[0] > now:
+                return entry[1]
+
+        rules, ttl = self._fetch(origin)
+        with self.lock:
+            self.entries[origin] = (now + ttl, rules)
+        return rules
+
+    def can_fetch(self, url):
+        return self.get(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url):
+        delay = self.get(url).crawl_delay(self.user_agent)
+        return float(delay) if delay else None
+
+    def sitemaps(self, url):
+        return self.get(url).site_maps() or []
+
+    def _fetch(self, origin):
+        rules = RobotFileParser(origin + '/robots.txt')
+        try:
+            response = self.fetcher.get(origin + '/robots.txt')
+        except FetchError as e:
+            # No robots.txt (4xx) means everything is allowed. On server or
+            # network errors allow too, but check again soon.
+            rules.parse([])
+            if e.status is not None and 400 <= e.status < 500:
+                return rules, self.TTL
+            print(f"Error fetching robots.txt for {origin}: {e}")
+            return rules, self.ERROR_TTL
+
+        rules.parse(response.text.splitlines())
+        return rules, self.TTL
+
+
+_robots = None
+_robots_lock = threading.Lock()
+
+
+def get_robots():
+    """
+    Returns the process-wide RobotsCache.
+    """
+    global _robots
+    if _robots is None:
+        with _robots_lock:
+            if _robots is None:
+                _robots = RobotsCache()
+    return _robots
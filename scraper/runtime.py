@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+
+
+def process_memory(pid=None):
+    """
+    Returns (rss_bytes, thread_count) for a process (default: this one).
+    Reads /proc on Linux; elsewhere only the current process can be measured,
+    and its peak RSS stands in for the current one.
+    """
+    pid = pid or os.getpid()
+    try:
+        rss = threads = 0
+        with open(f"/proc/{pid}/status", encoding='ascii') as handle:
+            for line in handle:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith('Threads:'):
+                    threads = int(line.split()[1])
+        return rss, threads
+    except OSError:
+        if pid != os.getpid():
+            return 0, 0
+        try:
+            import resource
+        except ImportError:
+            return 0, threading.active_count()
+        # ru_maxrss is KB on Linux, bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if maxrss > 1 << 32 else maxrss * 1024, threading.active_count()
+
+
+def proportional_memory(pid=None):
+    """
+    Returns a process's proportional set size in bytes: private pages plus
+    its share of pages shared with other processes, e.g. forked workers.
+    Unlike RSS these add up across processes. None where /proc lacks it.
+    """
+    try:
+        with open(f"/proc/{pid or os.getpid()}/smaps_rollup", encoding='ascii') as handle:
+            for line in handle:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class WarmUp:
+    """
+    Runs a process's warm-up steps (engine construction, pools, first
+    parse) once, before it takes traffic, and records how long each took.
+    State goes cold -> warming -> ready, or failed if a step raised; a
+    failed process still serves requests, building what it needs lazily.
+    """
+
+    def __init__(self):
+        self.state = 'cold'
+        self.steps = {}
+        self.error = None
+        self.seconds = None
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def run(self, steps):
+        """
+        Runs (name, fn) steps in order and blocks until warm-up is over,
+        also when another thread started it. Returns True if ready.
+        """
+        with self.lock:
+            leader = self.state == 'cold'
+            if leader:
+                self.state = 'warming'
+        if not leader:
+            self.finished.wait()
+            return self.ready
+
+        started = time.perf_counter()
+        name = None
+        try:
+            for name, fn in steps:
+                step_started = time.perf_counter()
+                fn()
+                self.steps[name] = round((time.perf_counter() - step_started) * 1000, 2)
+            state = 'ready'
+        except Exception as e:
+            print(f"Error in warm-up step '{name}': {e}")
+            self.error = f"{name}: {e}"
+            state = 'failed'
+        self.seconds = time.perf_counter() - started
+        self.state = state
+        self.finished.set()
+        return self.ready
+
+    def start(self, steps):
+        """
+        Runs warm-up in a background thread, unless it already ran.
+        """
+        if self.state == 'cold':
+            threading.Thread(target=self.run, args=(steps,), name='warm-up', daemon=True).start()
+
+    def stats(self):
+        rss, threads = process_memory()
+        return {
+            'pid': os.getpid(),
+            'state': self.state,
+            'warm_ms': round(self.seconds * 1000, 2) if self.seconds is not None else None,
+            'steps': dict(self.steps),
+            'error': self.error,
+            'rss_mb': round(rss / (1024 * 1024), 1),
+            'threads': threads,
+        }
@@ -1,150 +1,496 @@
 import concurrent.futures
 from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
+import os
 import time
 import threading
 
-from .fetcher import Fetcher
+from .fetcher import Fetcher, FetchError
 from .parser import Parser
+from . import qos
 from .filters import ContentFilter
+from .frontier import Frontier, build_scorer
+from .memory import MemoryStats, PageMemory, get_budget, release_tree, tree_bytes
+from .boilerplate import get_template
+from .delta import DeltaTracker
+from .robots import get_robots
+from .search import get_index
+from .sitemap import SitemapReader, parse_lastmod
+from .state import StateStore
 from .utils import is_valid_url, normalize_url, get_domain
 
+# Reason codes reported in ScraperEngine.stop_reason
+STOP_COMPLETED = 'completed'
+STOP_MAX_PAGES = 'max_pages'
+STOP_TIME_BUDGET = 'time_budget'
+STOP_BYTE_BUDGET = 'byte_budget'
+
+# 'links' discovers pages by following anchors from base_url only;
+# 'sitemap' also seeds the frontier from robots.txt / sitemap.xml
+CRAWL_MODES = ('links', 'sitemap')
+
+# Outgoing links remembered per page, so an unchanged (304) page can
+# still expand the frontier on an incremental recrawl
+STORED_LINKS_PER_PAGE = 100
+
 class ScraperEngine:
     def __init__(self, base_url, config):
         self.base_url = base_url
         self.config = config
-        
+
         # Configuration
         self.max_pages = int(config.get('max_pages', 10))
         self.max_depth = int(config.get('depth', 2))
         self.links_per_page = int(config.get('links_per_page', 5))
-        
+
+        # Crawl budgets (None = unlimited)
+        self.max_seconds = float(config['max_seconds']) if config.get('max_seconds') else None
+        self.max_bytes = int(config['max_bytes']) if config.get('max_bytes') else None
+
         self.domain = get_domain(base_url)
         self.visited_urls = set()
         self.visited_lock = threading.Lock()
         self.results = []
-        
+        self.pages_scraped = 0
+
+        # Sinks (e.g. exporters) receive each page as soon as it is scraped.
+        # With keep_results off, pages go only to the sinks to bound memory.
+        self.sinks = []
+        self.keep_results = config.get('keep_results', True)
+
         self.fetcher = Fetcher()
+        self.max_retries = int(config.get('max_retries', self.fetcher.retries))
         self.content_filter = ContentFilter(config.get('sections', {}))
-        
+        # Per-page memory by stage; the budget is shared by every crawl
+        self.memory = MemoryStats()
+        self.memory_budget = get_budget()
+        self.scorer = build_scorer(config.get('frontier'))
+
+        # Recrawl mode
+        self.mode = config.get('mode') or 'links'
+        if self.mode not in CRAWL_MODES:
+            raise ValueError(f"Unknown crawl mode: {self.mode}")
+        self.incremental = bool(config.get('incremental', False))
+        self.respect_robots = config.get('respect_robots', self.mode == 'sitemap')
+        self.robots = get_robots()
+        self.state_dir = config.get('state_dir')
+        self.recrawl_store = StateStore('recrawl', self.state_dir)
+        self.recrawl_state = {}
+        self.fetched_state = {}
+        self.sitemap_lastmod = {}
+        self.unchanged_urls = set()
+        self.state_lock = threading.Lock()
+        self.crawl_delay = None
+        self.next_fetch_at = 0.0
+        self.sitemap_complete = False
+        self.sitemap_urls = 0
+        self.skipped_unchanged = 0
+        self.not_modified = 0
+        self.robots_blocked = 0
+
+        # Change detection against the previous run's section hashes
+        self.delta_tracker = None
+        if config.get('delta'):
+            self.delta_tracker = DeltaTracker(self.domain, StateStore('delta', self.state_dir))
+        if self.delta_tracker:
+            self.add_sink(self.delta_tracker)
+        self.gone_urls = set()
+        self.failed_urls = set()
+        self.delta = None
+
+        # Site template learned from earlier pages (and runs); blocks that
+        # recur on most pages are dropped before extraction
+        self.template = None
+        if config.get('boilerplate'):
+            self.template = get_template(self.domain, self.state_dir)
+
+        # Full-text index fed as pages stream in, searchable via /search
+        self.indexer = None
+        if config.get('index'):
+            index_dir = os.path.join(self.state_dir, 'index') if self.state_dir else None
+            self.indexer = get_index(index_dir).writer()
+            self.add_sink(self.indexer)
+
+        self.started_at = None
+        self.deadline = None
+        self.bytes_fetched = 0
+        self.bytes_lock = threading.Lock()
+        self.retries = 0
+        self.stop_reason = None
+
         # Determine number of threads
         self.max_workers = 5
 
+        # One pooled connection per worker for the crawled host
+        self.fetcher.client.ensure_pool_size(base_url, self.max_workers)
+
+    def add_sink(self, sink):
+        """
+        Registers an object with a write(page) method to stream results to.
+        """
+        self.sinks.append(sink)
+
+    def remaining_time(self):
+        """
+        Seconds left in the time budget, or None if there is no budget.
+        """
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
     def scrape_page(self, url, current_depth):
         """
-        Scrapes a single page and returns extracted data and new links.
+        Scrapes a single page and returns extracted data and candidate links.
+        Raises FetchError so the caller can decide whether to retry later.
         """
-        # Double check visited inside thread (though we check before submitting too)
-        with self.visited_lock:
-            if url in self.visited_urls:
-                return None, []
-            self.visited_urls.add(url)
-        
         print(f"Scraping: {url} (Depth: {current_depth})")
-        
-        response = self.fetcher.fetch(url)
-        if not response:
-            return None, []
-            
-        soup = Parser.parse(response.text)
+
+        # Never let a single request outlive the crawl's time budget
+        timeout = self.fetcher.timeout
+        remaining = self.remaining_time()
+        if remaining is not None:
+            timeout = max(0.1, min(timeout, remaining))
+
+        # On incremental recrawls ask the server whether the page changed
+        previous = self.recrawl_state.get(url) or {}
+        headers = {}
+        if self.incremental:
+            if previous.get('etag'):
+                headers['If-None-Match'] = previous['etag']
+            if previous.get('last_modified'):
+                headers['If-Modified-Since'] = previous['last_modified']
+
+        response = self.fetcher.get(url, timeout=timeout, headers=headers)
+        with self.bytes_lock:
+            self.bytes_fetched += len(response.content)
+
+        if response.status_code == 304:
+            with self.state_lock:
+                self.not_modified += 1
+                self.unchanged_urls.add(url)
+            candidates = []
+            if current_depth < self.max_depth:
+                candidates = [
+                    {'url': link_url, 'text': text, 'context': context}
+                    for link_url, text, context in previous.get('links', [])
+                ]
+            return None, candidates
+
+        # Heavy pages lower parse concurrency instead of piling up trees;
+        # bulk parsing yields CPU to interactive summaries (see qos)
+        with PageMemory(url, len(response.content)) as page:
+            try:
+                with self.memory_budget.hold(tree_bytes(page.html_bytes)), qos.slot('cpu'):
+                    return self.process_page(url, response, current_depth, page)
+            finally:
+                self.memory.add(page)
+
+    def process_page(self, url, response, current_depth, page):
+        """
+        Parses a fetched page and returns extracted data and candidate links.
+        The tree is torn down before returning; `page` records its memory.
+        """
+        # Only build the parts of the tree the enabled sections and link discovery need
+        soup = Parser.parse(
+            response.text,
+            sections=self.content_filter.config,
+            follow_links=current_depth < self.max_depth
+        )
+        page.mark('parse')
         if not soup:
             return None, []
-            
-        # Extract content
-        data = self.content_filter.extract(soup, url)
-        data['url'] = url
-        
-        # Extract links for next depth
-        new_links = []
-        if current_depth < self.max_depth:
-            raw_links = Parser.extract_links(soup, url)
-            count = 0
-            for link in raw_links:
-                if count >= self.links_per_page:
-                    break
-                    
-                abs_link = normalize_url(url, link)
-                if (abs_link and 
-                    is_valid_url(abs_link) and 
-                    get_domain(abs_link) == self.domain):
-                    
-                    # We don't check visited here to avoid lock contention, 
-                    # we filter in the main loop or just let the set handle it
-                    new_links.append(abs_link)
-                    count += 1
-                    
-        return data, new_links
+
+        try:
+            # Collect same-domain links for the next depth; the frontier scores
+            # them and keeps the best `links_per_page`
+            candidates = []
+            if current_depth < self.max_depth:
+                seen_here = set()
+                for link in Parser.extract_link_candidates(soup):
+                    abs_link = normalize_url(url, link['href'])
+                    if (abs_link and
+                        abs_link not in seen_here and
+                        is_valid_url(abs_link) and
+                        get_domain(abs_link) == self.domain):
+
+                        seen_here.add(abs_link)
+                        candidates.append({
+                            'url': abs_link,
+                            'text': link['text'],
+                            'context': link['context']
+                        })
+
+            # Link discovery above still sees the site chrome; extraction doesn't
+            if self.template:
+                self.template.learn(soup, url)
+                self.template.strip(soup)
+
+            # Extract content
+            data = self.content_filter.extract(soup, url, self.template)
+            data['url'] = url
+            page.mark('extract')
+        finally:
+            release_tree(soup)
+        page.mark('teardown')
+
+        if self.incremental:
+            self.remember(url, response, candidates)
+
+        return data, candidates
+
+    def remember(self, url, response, candidates):
+        """
+        Records what the next incremental run needs to skip this page if unchanged.
+        """
+        entry = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'lastmod': self.sitemap_lastmod.get(url),
+            'links': [
+                [c['url'], c['text'], c['context']]
+                for c in candidates[:STORED_LINKS_PER_PAGE]
+            ],
+        }
+        with self.state_lock:
+            self.fetched_state[url] = {k: v for k, v in entry.items() if v}
+
+    def save_recrawl_state(self):
+        """
+        Merges this run's validators into the stored state for the domain.
+        """
+        state = dict(self.recrawl_state)
+        for url in self.unchanged_urls:
+            if url in state and self.sitemap_lastmod.get(url):
+                state[url] = dict(state[url], lastmod=self.sitemap_lastmod[url])
+        state.update(self.fetched_state)
+        self.recrawl_store.save(self.domain, state)
+
+    def is_unchanged(self, url, lastmod):
+        """
+        True if the sitemap lastmod is not newer than the one stored last run.
+        """
+        stored = parse_lastmod((self.recrawl_state.get(url) or {}).get('lastmod'))
+        return bool(lastmod and stored and lastmod <= stored)
+
+    def seed_from_sitemaps(self, frontier):
+        """
+        Adds same-domain URLs listed in the site's sitemaps to the frontier.
+        On incremental runs, URLs whose lastmod did not change are skipped.
+        """
+        parsed = urlparse(self.base_url)
+        sitemap_urls = self.robots.sitemaps(self.base_url) or [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"]
+
+        self.sitemap_complete = False
+        for entry in SitemapReader(self.fetcher).iter_urls(sitemap_urls):
+            if self.budget_exceeded():
+                return
+            url = normalize_url(self.base_url, entry['loc'])
+            if not url or not is_valid_url(url) or get_domain(url) != self.domain:
+                continue
+
+            self.sitemap_urls += 1
+            if self.respect_robots and not self.robots.can_fetch(url):
+                self.robots_blocked += 1
+                continue
+            if entry['lastmod']:
+                self.sitemap_lastmod[url] = entry['lastmod'].isoformat()
+            if self.incremental and self.is_unchanged(url, entry['lastmod']):
+                self.skipped_unchanged += 1
+                self.unchanged_urls.add(url)
+                continue
+
+            priority = entry['priority']
+            frontier.push(url, 1, 0.5 if priority is None else priority)
+        self.sitemap_complete = True
+
+    def budget_exceeded(self):
+        """
+        Returns the stop reason code if a crawl budget is used up, else None.
+        """
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return STOP_TIME_BUDGET
+        if self.max_bytes is not None and self.bytes_fetched >= self.max_bytes:
+            return STOP_BYTE_BUDGET
+        return None
 
     def run(self):
         """
         Main execution method using ThreadPoolExecutor.
+
+        Workers never sleep on retries: a failed URL goes back into the
+        frontier with a not-before time and the worker takes the next one.
         """
         if not is_valid_url(self.base_url):
             return {"error": "Invalid Base URL"}
 
-        # Queue of URLs to scrape: (url, depth)
-        queue = [(self.base_url, 1)]
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + self.max_seconds if self.max_seconds else None
+        self.bytes_fetched = 0
+        self.retries = 0
+        self.stop_reason = None
         self.results = []
-        
-        # Track scheduled URLs to avoid duplicates in queue
-        scheduled_urls = {self.base_url}
-        
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            while queue and len(self.visited_urls) < self.max_pages:
-                # Prepare a batch of futures
-                futures = {}
-                
-                # Take items from queue up to remaining capacity
-                current_batch = []
-                while queue and len(scheduled_urls) < self.max_pages + len(queue): # Approximate check
-                    # We need to be careful not to over-schedule if we want to respect max_pages STRICTLY
-                    # But for performance, slightly over-fetching is often okay. 
-                    # Here we try to stick to the limit.
-                    
-                    if len(self.visited_urls) + len(current_batch) >= self.max_pages:
-                        break
-                        
-                    url, depth = queue.pop(0)
-                    
-                    # Check if already visited (in case it was added by another batch, though scheduled_urls handles this)
+        self.pages_scraped = 0
+        self.fetched_state = {}
+        self.unchanged_urls = set()
+        self.gone_urls = set()
+        self.failed_urls = set()
+        self.next_fetch_at = 0.0
+
+        if self.incremental:
+            self.recrawl_state = self.recrawl_store.load(self.domain)
+        self.crawl_delay = self.robots.crawl_delay(self.base_url) if self.respect_robots else None
+
+        # Best-first frontier of (url, depth), seeded with the start page
+        frontier = Frontier(self.scorer)
+        frontier.push(self.base_url, 1)
+        if self.mode == 'sitemap':
+            self.seed_from_sitemaps(frontier)
+        attempts = {}
+        futures = {}
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while True:
+                self.stop_reason = self.budget_exceeded()
+                if self.stop_reason:
+                    break
+
+                # Keep every worker busy with the best URLs that are due
+                while (len(futures) < self.max_workers and
+                       len(self.visited_urls) < self.max_pages and
+                       time.monotonic() >= self.next_fetch_at and
+                       frontier.ready()):
+                    url, depth, score = frontier.pop()
+                    if self.respect_robots and not self.robots.can_fetch(url):
+                        self.robots_blocked += 1
+                        continue
                     with self.visited_lock:
                         if url in self.visited_urls:
                             continue
+                        self.visited_urls.add(url)
+                    if self.crawl_delay:
+                        self.next_fetch_at = time.monotonic() + self.crawl_delay
+                    future = executor.submit(self.scrape_page, url, depth)
+                    futures[future] = (url, depth, score)
+
+                if not futures:
+                    if len(self.visited_urls) >= self.max_pages:
+                        self.stop_reason = STOP_MAX_PAGES
+                        break
+                    if not frontier:
+                        self.stop_reason = STOP_COMPLETED
+                        break
+                    # Waiting on deferred retries or the crawl-delay
+                    time.sleep(self._wait_timeout(frontier, futures) or 0.01)
+                    continue
+
+                done, _ = concurrent.futures.wait(
+                    futures,
+                    timeout=self._wait_timeout(frontier, futures),
+                    return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    self._collect(future, futures.pop(future), frontier, attempts)
+
+            if self.stop_reason == STOP_BYTE_BUDGET and futures:
+                # Those pages are already downloaded; keep what finishes in time
+                done, _ = concurrent.futures.wait(futures, timeout=self.remaining_time())
+                for future in done:
+                    self._collect(future, futures.pop(future), frontier, attempts)
+        finally:
+            # In-flight requests are capped by the time budget; don't wait on them
+            executor.shutdown(wait=not futures, cancel_futures=True)
+
+        if self.incremental:
+            self.save_recrawl_state()
+        if self.template:
+            self.template.save()
+        if self.indexer:
+            self.indexer.close()
+        if self.delta_tracker:
+            self.delta = self.finish_delta()
 
-                    current_batch.append((url, depth))
-                
-                if not current_batch:
-                    if not futures and not queue:
-                         # No running tasks and no queue -> done
-                         break
-                    if not current_batch and futures:
-                         # Wait for some futures to complete
-                         pass
-                    elif not current_batch and not futures:
-                         break
-
-                # Submit batch
-                for url, depth in current_batch:
-                    futures[executor.submit(self.scrape_page, url, depth)] = depth
-
-                # Wait for this batch to finish (simplified generation-based BFS)
-                # For true async, we'd add to queue as we go, but managing the pool is trickier.
-                # Batch processing is safer for depth control.
-                for future in concurrent.futures.as_completed(futures):
-                    depth = futures[future]
-                    try:
-                        data, new_links = future.result()
-                        if data:
-                            self.results.append(data)
-                        
-                        # Add new links to queue if depth allows
-                        if depth < self.max_depth:
-                            for link in new_links:
-                                if link not in scheduled_urls:
-                                    scheduled_urls.add(link)
-                                    queue.append((link, depth + 1))
-                                    
-                    except Exception as e:
-                        print(f"Error processing future: {e}")
-                
         return self.results
+
+    def finish_delta(self):
+        """
+        Builds the delta against the previous run. Pages skipped as unchanged
+        or that failed to fetch carry over. URLs are reported removed when
+        they return 404/410, or, after a full sitemap crawl, when the sitemap
+        no longer lists them.
+        """
+        for url in self.unchanged_urls | self.failed_urls:
+            self.delta_tracker.keep(url)
+        complete = (self.mode == 'sitemap' and
+                    self.sitemap_complete and
+                    self.stop_reason == STOP_COMPLETED)
+        return self.delta_tracker.finish(self.gone_urls, complete=complete)
+
+    def _wait_timeout(self, frontier, futures):
+        timeouts = []
+        if self.deadline is not None:
+            timeouts.append(self.remaining_time())
+        if len(futures) < self.max_workers:
+            next_ready = frontier.next_ready_at()
+            if next_ready is not None:
+                timeouts.append(max(0.0, next_ready - time.monotonic()))
+            if self.crawl_delay and frontier.ready():
+                timeouts.append(max(0.0, self.next_fetch_at - time.monotonic()))
+        return min(timeouts) if timeouts else None
+
+    def _collect(self, future, task, frontier, attempts):
+        url, depth, score = task
+        try:
+            data, candidates = future.result()
+            if data:
+                self.pages_scraped += 1
+                for sink in self.sinks:
+                    sink.write(data)
+                if self.keep_results:
+                    self.results.append(data)
+
+            # Schedule the best new links if depth allows
+            if depth < self.max_depth:
+                frontier.offer(candidates, depth + 1, self.links_per_page)
+
+        except FetchError as e:
+            attempt = attempts.get(url, 0) + 1
+            attempts[url] = attempt
+            if e.retryable and attempt <= self.max_retries:
+                self.retries += 1
+                with self.visited_lock:
+                    self.visited_urls.discard(url)
+                delay = self.fetcher.backoff(attempt, e.retry_after)
+                frontier.defer(url, depth, score, time.monotonic() + delay)
+            else:
+                if e.status in (404, 410):
+                    self.gone_urls.add(url)
+                else:
+                    self.failed_urls.add(url)
+                print(f"Error fetching {url}: {e}")
+
+        except Exception as e:
+            print(f"Error processing future: {e}")
+
+    def stats(self):
+        """
+        Summary of the last run, including why it stopped.
+        """
+        stats = {
+            'stop_reason': self.stop_reason,
+            'pages': self.pages_scraped,
+            'bytes': self.bytes_fetched,
+            'retries': self.retries,
+            'mode': self.mode,
+            'sitemap_urls': self.sitemap_urls,
+            'skipped_unchanged': self.skipped_unchanged,
+            'not_modified': self.not_modified,
+            'robots_blocked': self.robots_blocked,
+            'elapsed': round(time.monotonic() - self.started_at, 3) if self.started_at else 0.0,
+        }
+        if self.template:
+            stats['boilerplate'] = self.template.stats()
+        if self.content_filter.prober:
+            stats['image_probe'] = self.content_filter.prober.stats()
+        stats['memory'] = self.memory.stats()
+        return stats
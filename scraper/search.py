@@ -0,0 +1,446 @@
+import fcntl
+import gzip
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+
+from .state import STATE_DIR
+
+INDEX_DIR = os.environ.get('SCRAPER_INDEX_DIR', os.path.join(STATE_DIR, 'index'))
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Title terms count this many times towards a page's term frequencies
+TITLE_BOOST = 3
+
+# Pages buffered in memory before a segment is written
+FLUSH_EVERY = 500
+
+# Segments are merged into one once there are more than this many
+MAX_SEGMENTS = 8
+
+SNIPPET_CHARS = 160
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return [token for token in TOKEN.findall(text.lower()) if len(token) > 1]
+
+
+def encode_varints(numbers):
+    """
+    LEB128-style variable length encoding of non-negative ints.
+    """
+    out = bytearray()
+    for number in numbers:
+        while number >= 0x80:
+            out.append((number & 0x7f) | 0x80)
+            number >>= 7
+        out.append(number)
+    return bytes(out)
+
+
+def decode_varints(data):
+    numbers = []
+    number = shift = 0
+    for byte in data:
+        number |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            numbers.append(number)
+            number = shift = 0
+    return numbers
+
+
+def page_text(page):
+    """
+    Title and searchable body text of a scraped page: headings,
+    paragraphs, table cells and link text.
+    """
+    parts = list(page.get('headings') or [])
+    parts.extend(page.get('paragraphs') or [])
+    for table in page.get('tables') or []:
+        parts.append(' '.join(str(cell) for cell in table.get('headers') or [] if cell))
+        rows = table.get('rows')
+        if rows is None:
+            rows = zip(*table.get('columns') or [])
+        for row in rows:
+            parts.append(' '.join(str(cell) for cell in row if cell))
+    parts.extend(link.get('text', '') for link in page.get('links') or [])
+    return page.get('title') or '', '\n'.join(part for part in parts if part)
+
+
+class Segment:
+    """
+    One immutable on-disk index segment, made of three files:
+    <name>.post  varint postings (doc id deltas and term frequencies) per term
+    <name>.docs  zlib-compressed stored documents (url, title, text) for snippets
+    <name>.meta.gz  term dictionary {term: [offset, length, df]} and doc table
+    """
+
+    def __init__(self, directory, name):
+        self.directory = directory
+        self.name = name
+        with gzip.open(self.path('meta.gz'), 'rt', encoding='utf-8') as handle:
+            meta = json.load(handle)
+        self.terms = meta['terms']
+        # [url, length, offset, size] per doc id
+        self.docs = meta['docs']
+
+    def path(self, suffix):
+        return os.path.join(self.directory, f"{self.name}.{suffix}")
+
+    def postings(self, term):
+        """
+        Returns [(doc_id, tf), ...] for a term.
+        """
+        entry = self.terms.get(term)
+        if not entry:
+            return []
+        offset, length, _ = entry
+        with open(self.path('post'), 'rb') as handle:
+            handle.seek(offset)
+            numbers = decode_varints(handle.read(length))
+        postings = []
+        doc_id = 0
+        for delta, tf in zip(numbers[::2], numbers[1::2]):
+            doc_id += delta
+            postings.append((doc_id, tf))
+        return postings
+
+    def document(self, doc_id):
+        _, _, offset, size = self.docs[doc_id]
+        with open(self.path('docs'), 'rb') as handle:
+            handle.seek(offset)
+            return json.loads(zlib.decompress(handle.read(size)).decode('utf-8'))
+
+    def files(self):
+        return [self.path(suffix) for suffix in ('post', 'docs', 'meta.gz')]
+
+    @classmethod
+    def write(cls, directory, name, documents):
+        """
+        Writes documents [(url, title, text, term_counts), ...] as a new segment.
+        """
+        postings = {}
+        docs = []
+        with open(os.path.join(directory, f"{name}.docs"), 'wb') as doc_file:
+            offset = 0
+            for doc_id, (url, title, text, counts) in enumerate(documents):
+                blob = zlib.compress(json.dumps({'url': url, 'title': title, 'text': text},
+                                                separators=(',', ':')).encode('utf-8'))
+                doc_file.write(blob)
+                docs.append([url, sum(counts.values()), offset, len(blob)])
+                offset += len(blob)
+                for term, tf in counts.items():
+                    postings.setdefault(term, []).append((doc_id, tf))
+
+        terms = {}
+        with open(os.path.join(directory, f"{name}.post"), 'wb') as post_file:
+            offset = 0
+            for term in sorted(postings):
+                numbers = []
+                previous = 0
+                for doc_id, tf in postings[term]:
+                    numbers.extend((doc_id - previous, tf))
+                    previous = doc_id
+                blob = encode_varints(numbers)
+                post_file.write(blob)
+                terms[term] = [offset, len(blob), len(postings[term])]
+                offset += len(blob)
+
+        with gzip.open(os.path.join(directory, f"{name}.meta.gz"), 'wt', encoding='utf-8') as handle:
+            json.dump({'terms': terms, 'docs': docs}, handle, separators=(',', ':'))
+        return cls(directory, name)
+
+
+class SearchIndex:
+    """
+    Segmented on-disk inverted index with BM25 ranking.
+
+    Writers add immutable segments; a manifest lists the live ones. When a
+    URL is indexed again, the copy in the newest segment wins and older
+    copies are ignored until compaction rewrites them away. Segment names
+    sort by creation time and manifest updates hold an exclusive lock on
+    manifest.lock, so several processes can share one directory.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or INDEX_DIR
+        self.lock = threading.Lock()
+        self.segments = []
+        # Never equal to a manifest's mtime (or None, no manifest yet), so
+        # the first _sync always loads and sets live/total_docs/avg_length
+        self.manifest_mtime = -1
+        with self.lock:
+            self._sync()
+
+    def writer(self):
+        return IndexWriter(self)
+
+    def add_segment(self, documents):
+        """
+        Writes documents as a new segment and makes it visible to searches.
+        """
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            segment = Segment.write(self.directory, self._segment_name(), documents)
+            self.segments.append(segment)
+            with self._manifest_lock():
+                self._sync(save=True)
+            needs_merge = len(self.segments) > MAX_SEGMENTS
+        if needs_merge:
+            self.compact()
+
+    def compact(self):
+        """
+        Merges all segments into one, dropping superseded copies of pages.
+        """
+        with self.lock, self._manifest_lock():
+            self._sync(force=True)
+            if len(self.segments) < 2 and not self._superseded():
+                return
+            documents = []
+            for segment, doc_id in self._live_docs():
+                doc = segment.document(doc_id)
+                counts = Counter(tokenize(doc['text']))
+                for term in tokenize(doc['title']):
+                    counts[term] += TITLE_BOOST
+                documents.append((doc['url'], doc['title'], doc['text'], counts))
+
+            old = self.segments
+            self.segments = [Segment.write(self.directory, self._segment_name(), documents)]
+            self._sync(save=True, removed={segment.name for segment in old})
+            for segment in old:
+                for path in segment.files():
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def search(self, query, k=10, _retry=True):
+        """
+        Returns the top-k pages for a query as dicts with url, title, score
+        and a snippet around the first matching term.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self.lock:
+            self._sync()
+            segments = list(self.segments)
+            live = self.live
+            total_docs = self.total_docs
+            avg_length = self.avg_length
+        if not terms or not total_docs:
+            return []
+
+        try:
+            return self._search(terms, k, segments, live, total_docs, avg_length)
+        except FileNotFoundError:
+            # A concurrent compaction removed a segment; search the new one
+            if not _retry:
+                raise
+            return self.search(query, k, _retry=False)
+
+    def _search(self, terms, k, segments, live, total_docs, avg_length):
+        postings = {(segment.name, term): segment.postings(term) for segment in segments for term in terms}
+        scores = {}
+        for term in terms:
+            df = sum(len(postings[(segment.name, term)]) for segment in segments)
+            if not df:
+                continue
+            idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+            for segment in segments:
+                for doc_id, tf in postings[(segment.name, term)]:
+                    url, length = segment.docs[doc_id][:2]
+                    if live.get(url) != (segment.name, doc_id):
+                        continue
+                    norm = K1 * (1 - B + B * length / avg_length)
+                    key = (segment, doc_id)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        results = []
+        for (segment, doc_id), score in top:
+            doc = segment.document(doc_id)
+            results.append({
+                'url': doc['url'],
+                'title': doc['title'],
+                'score': round(score, 4),
+                'snippet': self.snippet(doc['text'], terms),
+            })
+        return results
+
+    @staticmethod
+    def snippet(text, terms):
+        lower = text.lower()
+        positions = [lower.find(term) for term in terms]
+        positions = [position for position in positions if position >= 0]
+        start = max(0, min(positions) - SNIPPET_CHARS // 4) if positions else 0
+        snippet = ' '.join(text[start:start + SNIPPET_CHARS].split())
+        if start > 0:
+            snippet = '...' + snippet
+        if start + SNIPPET_CHARS < len(text):
+            snippet += '...'
+        return snippet
+
+    def stats(self):
+        with self.lock:
+            self._sync()
+            return {
+                'segments': len(self.segments),
+                'documents': self.total_docs,
+                'terms': sum(len(segment.terms) for segment in self.segments),
+                'bytes': sum(os.path.getsize(path) for segment in self.segments
+                             for path in segment.files() if os.path.exists(path)),
+            }
+
+    def _live_docs(self):
+        return [
+            (segment, doc_id)
+            for segment in self.segments
+            for doc_id, doc in enumerate(segment.docs)
+            if self.live.get(doc[0]) == (segment.name, doc_id)
+        ]
+
+    def _superseded(self):
+        return sum(len(segment.docs) for segment in self.segments) > len(self.live)
+
+    @staticmethod
+    def _segment_name():
+        # Fixed width so names sort in creation order
+        return f"seg{time.time_ns():020d}-{os.getpid()}"
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, 'manifest.json')
+
+    @contextmanager
+    def _manifest_lock(self):
+        """
+        Exclusive lock between processes, held from reading the manifest to
+        replacing it, so concurrent writers do not drop each other's segments.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, 'manifest.lock'), 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _sync(self, save=False, removed=(), force=False):
+        """
+        Merges our segment list with the manifest on disk (other processes
+        may have added or compacted segments) and optionally writes it back.
+        Must be called with self.lock held, and with _manifest_lock() held
+        when saving.
+        """
+        path = self._manifest_path()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if not (save or force) and mtime == self.manifest_mtime:
+            return
+
+        names = {segment.name for segment in self.segments}
+        try:
+            with open(path, encoding='utf-8') as handle:
+                names.update(json.load(handle).get('segments', []))
+        except (OSError, ValueError):
+            pass
+        names -= set(removed)
+
+        loaded = {segment.name: segment for segment in self.segments}
+        segments = []
+        for name in sorted(names):
+            # Skip segments another process has compacted away
+            if not os.path.exists(os.path.join(self.directory, f"{name}.meta.gz")):
+                continue
+            segments.append(loaded.get(name) or Segment(self.directory, name))
+        self.segments = segments
+
+        if save:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+                    json.dump({'segments': [segment.name for segment in segments]}, handle)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            mtime = os.stat(path).st_mtime_ns
+        self.manifest_mtime = mtime
+        self._refresh()
+
+    def _refresh(self):
+        # Latest copy of every URL; later segments override earlier ones
+        live = {}
+        lengths = {}
+        for segment in self.segments:
+            for doc_id, (url, length, _, _) in enumerate(segment.docs):
+                live[url] = (segment.name, doc_id)
+                lengths[url] = length
+        self.live = live
+        self.total_docs = len(live)
+        total_length = sum(lengths.values())
+        self.avg_length = total_length / len(lengths) if total_length else 1.0
+
+
+class IndexWriter:
+    """
+    Sink that tokenizes pages as they stream in and flushes them to the
+    index as segments of up to FLUSH_EVERY pages.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.indexed = 0
+
+    def write(self, page):
+        title, text = page_text(page)
+        counts = Counter(tokenize(text))
+        for term in tokenize(title):
+            counts[term] += TITLE_BOOST
+        if not counts:
+            return
+
+        with self.lock:
+            self.buffer.append((page['url'], title, text, counts))
+            self.indexed += 1
+            if len(self.buffer) < FLUSH_EVERY:
+                return
+            documents, self.buffer = self.buffer, []
+        self.index.add_segment(documents)
+
+    def close(self):
+        with self.lock:
+            documents, self.buffer = self.buffer, []
+        if documents:
+            self.index.add_segment(documents)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(directory=None):
+    """
+    Returns the process-wide SearchIndex for a directory.
+    """
+    directory = directory or INDEX_DIR
+    with _indexes_lock:
+        if directory not in _indexes:
+            _indexes[directory] = SearchIndex(directory)
+        return _indexes[directory]
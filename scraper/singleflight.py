@@ -0,0 +1,103 @@
+import threading
+import time
+
+
+class CoalesceTimeout(Exception):
+    """
+    Raised to a caller whose deadline passed while it waited for another
+    caller's identical work to finish.
+    """
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical work: while a computation for a key is
+    running, other callers with the same key wait for it and receive the
+    same result (or exception) instead of starting their own.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key, fn, *args, deadline=None, **kwargs):
+        """
+        Runs fn(*args, **kwargs), or waits for the identical call already
+        running. A waiting caller gives up with CoalesceTimeout once the
+        monotonic `deadline` passes; the running call is not affected.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self.calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not call.done.wait(timeout):
+                with self.lock:
+                    self.timeouts += 1
+                raise CoalesceTimeout(f"Gave up after {timeout:.2f}s waiting for in-flight {self.name} work")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self.lock:
+            total = self.executed + self.coalesced
+            return {
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts,
+                'in_flight': len(self.calls),
+                'saved_ratio': round(self.coalesced / total, 3) if total else 0.0,
+            }
+
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def get_group(name):
+    """
+    Returns the process-wide SingleFlight group with the given name.
+    """
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name)
+        return _groups[name]
+
+
+def stats():
+    """
+    Counters for every group, keyed by name.
+    """
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
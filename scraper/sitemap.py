@@ -0,0 +1,113 @@
+import gzip
+import io
+from datetime import datetime, timezone
+from xml.etree import ElementTree
+
+from .fetcher import Fetcher, FetchError
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def parse_lastmod(value):
+    """
+    Parses a W3C datetime (as used by <lastmod>) into an aware UTC datetime.
+    Returns None if the value is missing or malformed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+class SitemapReader:
+    """
+    Streams URLs out of sitemap.xml files and sitemap indexes.
+    Documents are parsed incrementally (gzip-aware), so large sitemaps
+    never have to be held in memory.
+    """
+
+    def __init__(self, fetcher=None, max_urls=50000, max_sitemaps=50):
+        self.fetcher = fetcher or Fetcher()
+        self.max_urls = max_urls
+        self.max_sitemaps = max_sitemaps
+
+    def iter_urls(self, sitemap_urls):
+        """
+        Yields dicts with loc, lastmod (datetime or None) and priority (float or None).
+        Nested sitemap indexes are followed breadth-first.
+        """
+        pending = list(sitemap_urls)
+        seen = set()
+        emitted = 0
+        while pending and len(seen) < self.max_sitemaps:
+            sitemap_url = pending.pop(0)
+            if sitemap_url in seen:
+                continue
+            seen.add(sitemap_url)
+
+            for kind, entry in self._parse(sitemap_url):
+                if kind == 'sitemap':
+                    pending.append(entry['loc'])
+                    continue
+                yield entry
+                emitted += 1
+                if emitted >= self.max_urls:
+                    return
+
+    def _parse(self, sitemap_url):
+        try:
+            response = self.fetcher.get(sitemap_url, stream=True)
+        except FetchError as e:
+            print(f"Error fetching sitemap {sitemap_url}: {e}")
+            return
+
+        try:
+            # Undo Content-Encoding; a .gz sitemap file is detected by its magic bytes
+            response.raw.decode_content = True
+            response.raw.auto_close = False
+            stream = io.BufferedReader(response.raw)
+            if stream.peek(2)[:2] == GZIP_MAGIC:
+                stream = gzip.GzipFile(fileobj=stream)
+
+            entry = {}
+            root = None
+            for event, elem in ElementTree.iterparse(stream, events=('start', 'end')):
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                    continue
+                namespace, _, tag = elem.tag.rpartition('}')
+                if namespace and 'sitemaps.org' not in namespace:
+                    # Extensions such as image:loc must not override the page loc
+                    continue
+                if tag in ('loc', 'lastmod', 'priority'):
+                    entry[tag] = (elem.text or '').strip()
+                elif tag in ('url', 'sitemap'):
+                    if entry.get('loc'):
+                        yield tag, {
+                            'loc': entry['loc'],
+                            'lastmod': parse_lastmod(entry.get('lastmod')),
+                            'priority': self._priority(entry.get('priority')),
+                        }
+                    entry = {}
+                    # Drop parsed elements so memory stays flat
+                    root.clear()
+        except (ElementTree.ParseError, OSError, EOFError) as e:
+            print(f"Error parsing sitemap {sitemap_url}: {e}")
+        finally:
+            response.close()
+
+    @staticmethod
+    def _priority(value):
+        try:
+            return min(1.0, max(0.0, float(value)))
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,51 @@
+import gzip
+import json
+import os
+import re
+import tempfile
+import threading
+
+STATE_DIR = os.environ.get('SCRAPER_STATE_DIR', '.scraper_state')
+
+
+class StateStore:
+    """
+    Small local key/value store for data kept between crawls (recrawl
+    validators, content hashes, learned templates). Each key is one
+    gzip-compressed JSON file under <directory>/<namespace>/.
+    """
+
+    def __init__(self, namespace, directory=None):
+        self.directory = os.path.join(directory or STATE_DIR, namespace)
+        self.lock = threading.Lock()
+
+    def path(self, key):
+        safe_key = re.sub(r'[^A-Za-z0-9._-]', '_', key)
+        return os.path.join(self.directory, f"{safe_key}.json.gz")
+
+    def load(self, key, default=None):
+        """
+        Returns the stored value for key, or `default` if missing or unreadable.
+        """
+        try:
+            with gzip.open(self.path(key), 'rt', encoding='utf-8') as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {} if default is None else default
+
+    def save(self, key, value):
+        """
+        Atomically replaces the stored value for key.
+        """
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as raw:
+                    with gzip.open(raw, 'wt', encoding='utf-8') as handle:
+                        json.dump(value, handle, separators=(',', ':'))
+                os.replace(tmp_path, self.path(key))
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
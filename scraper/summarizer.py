@@ -1,13 +1,49 @@
 import random
+import time
 from .fetcher import Fetcher
 from .parser import Parser
+from . import qos
+from .memory import MemoryStats, PageMemory, get_budget, release_tree, tree_bytes
+from .singleflight import CoalesceTimeout, get_group
+from .boilerplate import get_template
+from .summary_cache import SummaryCache, RankState, sentence_hash
+from .utils import canonical_url, get_domain
 from collections import Counter
 import re
 import math
 
+# Built-in page summarized once by warm_up()
+WARM_UP_HTML = (
+    "<html><head><title>Warm-up</title></head><body><main>"
+    "<p>The crawler fetches pages from a site and follows the links it finds to discover new content.</p>"
+    "<p>Each page is parsed into a tree that the extractors walk to collect headings and paragraphs.</p>"
+    "<p>The summarizer ranks the sentences of a page by how strongly they relate to the others.</p>"
+    "</main></body></html>"
+)
+
 class SummarizerEngine:
-    def __init__(self):
+    # Learned site templates are written back to disk every N summarized pages
+    TEMPLATE_SAVE_EVERY = 10
+
+    # Peak bytes TextRank needs per sentence pair (similarity matrix plus
+    # neighbour lists, measured on dense pages); sizes its memory budget share
+    RANK_BYTES_PER_PAIR = 120
+
+    # Sentences ranked per page at most (at most ~120 MB by the estimate
+    # above, a few seconds of TextRank); longer pages keep their first ones
+    MAX_RANK_SENTENCES = 1000
+
+    def __init__(self, boilerplate=False, state_dir=None):
         self.fetcher = Fetcher()
+        # Skip blocks that recur across the pages of a site (menus, banners,
+        # footers); the default for calls that don't say
+        self.boilerplate = boilerplate
+        # Where learned templates are kept (see StateStore)
+        self.state_dir = state_dir
+        # Sentence verdicts and per-page TextRank state for incremental summaries
+        self.cache = SummaryCache()
+        # Per-page memory by stage (parse, extract, teardown, rank)
+        self.memory = MemoryStats()
         self.abbreviations = {'dr.', 'mr.', 'mrs.', 'ms.', 'jr.', 'sr.', 'e.g.', 'i.e.', 'vs.', 'ph.d.', 'u.s.', 'st.'}
         
         # Words that indicate a sentence is NOT suitable for a summary
@@ -18,9 +54,24 @@ class SummarizerEngine:
             'share this', 'follow us', 'advertisement', 'sponsored', 'related posts', 'leave a comment'
         }
 
-    def split_into_sentences(self, text):
+        # Stopwords to ignore in similarity check
+        self.similarity_stopwords = {'the', 'a', 'an', 'and', 'or', 'but', 'is', 'are', 'was', 'were', 'to', 'in', 'on', 'of', 'for', 'with', 'it', 'this', 'that'}
+
+    def warm_up(self):
+        """
+        Parses and ranks a built-in page once, so a new process sets up the
+        parser and compiles its regexes before the first real request.
+        Touches neither the network nor the caches.
+        """
+        soup = Parser.parse(WARM_UP_HTML)
+        text = " ".join(p.get_text(" ", strip=True) for p in soup.find_all('p'))
+        return self.text_rank_score(self.split_into_sentences(text))
+
+    def split_into_sentences(self, text, cache=None):
         """
         Smarter sentence splitting that handles common abbreviations.
+        With a SummaryCache, cleaning and quality checks are reused for
+        sentences seen before.
         """
         # specialized splitting to avoid breaking on abbreviations
         # 1. Protect known abbreviations
@@ -34,12 +85,17 @@ class SummarizerEngine:
         clean_sentences = []
         for s in sentences:
             s = s.replace('<PRD>', '.')
-            s = self.clean_sentence(s)
-            if self.is_high_quality_sentence(s):
+            s, keep = cache.memo('verdict', s, self.sentence_verdict) if cache else self.sentence_verdict(s)
+            if keep:
                 clean_sentences.append(s)
                 
         return clean_sentences
 
+    def sentence_verdict(self, text):
+        """Cleans a raw sentence and says whether it is worth keeping."""
+        text = self.clean_sentence(text)
+        return text, self.is_high_quality_sentence(text)
+
     def clean_sentence(self, text):
         # Remove citation markers like [1], [3]
         text = re.sub(r'\[\d+\]', '', text)
@@ -63,16 +119,16 @@ class SummarizerEngine:
 
     def calculate_similarity(self, s1, s2):
         """Calculates similarity between two sentences."""
+        return self.jaccard(self.tokenize(s1), self.tokenize(s2))
+
+    def tokenize(self, sentence):
+        """Set of lowercased content words used for similarity."""
         # Remove punctuation for better word matching
-        s1 = re.sub(r'[^\w\s]', '', s1)
-        s2 = re.sub(r'[^\w\s]', '', s2)
-        
-        # Stopwords to ignore in similarity check
-        stop = {'the', 'a', 'an', 'and', 'or', 'but', 'is', 'are', 'was', 'were', 'to', 'in', 'on', 'of', 'for', 'with', 'it', 'this', 'that'}
-        
-        set1 = {w for w in s1.lower().split() if w not in stop}
-        set2 = {w for w in s2.lower().split() if w not in stop}
-        
+        sentence = re.sub(r'[^\w\s]', '', sentence)
+        return frozenset(w for w in sentence.lower().split() if w not in self.similarity_stopwords)
+
+    @staticmethod
+    def jaccard(set1, set2):
         if not set1 or not set2: return 0.0
         
         intersection = len(set1.intersection(set2))
@@ -128,24 +184,94 @@ class SummarizerEngine:
         if n == 1: return [(1.0, 0, sentences[0])]
 
         # Build similarity matrix
-        scores = [1.0] * n
-        
+        tokens = [self.tokenize(s) for s in sentences]
+        matrix = [[0.0] * n for _ in range(n)]
+        for i in range(n):
+            for j in range(i + 1, n):
+                matrix[i][j] = matrix[j][i] = self.jaccard(tokens[i], tokens[j])
+
+        scores, _ = self.propagate(matrix, [1.0] * n)
+        return self.rank_sentences(sentences, scores)
+
+    def incremental_text_rank(self, sentences, previous=None):
+        """
+        TextRank that reuses an earlier run on the same page: similarities
+        between sentences that are still present are copied, only rows and
+        columns of new or edited sentences are computed, and the previous
+        scores seed the iteration, which stops once scores settle.
+        Returns (ranked sentences, RankState, counters).
+        """
+        n = len(sentences)
+        hashes = [sentence_hash(s) for s in sentences]
+        old_index = {h: i for i, h in enumerate(previous.hashes)} if previous else {}
+        counters = {
+            'sentences_reused': sum(1 for h in hashes if h in old_index),
+            'similarities_reused': 0,
+            'similarities_computed': 0,
+            'iterations': 0,
+        }
+        if n < 2:
+            return self.text_rank_score(sentences), RankState(hashes, [[0.0] * n for _ in range(n)], [1.0] * n), counters
+
+        if previous and previous.hashes == hashes:
+            # Nothing changed: the stored scores are the answer
+            return self.rank_sentences(sentences, previous.scores), previous, counters
+
+        tokens = [self.cache.memo('tokens', s, self.tokenize) for s in sentences]
+        matrix = [[0.0] * n for _ in range(n)]
+        for i in range(n):
+            pi = old_index.get(hashes[i])
+            for j in range(i + 1, n):
+                pj = old_index.get(hashes[j])
+                # Repeated sentences share one old row, whose diagonal is 0
+                if pi is not None and pj is not None and pi != pj:
+                    sim = previous.matrix[pi][pj]
+                    counters['similarities_reused'] += 1
+                else:
+                    sim = self.jaccard(tokens[i], tokens[j])
+                    counters['similarities_computed'] += 1
+                matrix[i][j] = matrix[j][i] = sim
+
+        start = [previous.scores[old_index[h]] if h in old_index else 1.0 for h in hashes]
+        scores, counters['iterations'] = self.propagate(matrix, start, tolerance=1e-3)
+        return self.rank_sentences(sentences, scores), RankState(hashes, matrix, scores), counters
+
+    def propagate(self, matrix, scores, iterations=3, tolerance=None):
+        """
+        PageRank-like score propagation over the similarity matrix.
+        Runs `iterations` rounds, or fewer once no score moves by more
+        than `tolerance`. Returns (scores, rounds run).
+        """
+        n = len(scores)
+        # Only positive similarities contribute
+        neighbours = [
+            [(j, sim) for j, sim in enumerate(row) if j != i and sim > 0]
+            for i, row in enumerate(matrix)
+        ]
+
         # Iterative scoring (PageRank-like)
         # We do a few iterations to propagate centrality
-        for _ in range(3): 
+        rounds = 0
+        for _ in range(iterations):
+            rounds += 1
             new_scores = [0.0] * n
             for i in range(n):
-                for j in range(n):
-                    if i == j: continue
-                    sim = self.calculate_similarity(sentences[i], sentences[j])
-                    if sim > 0:
-                        new_scores[i] += sim * scores[j]
+                for j, sim in neighbours[i]:
+                    new_scores[i] += sim * scores[j]
             
             # Normalize
             max_s = max(new_scores) if new_scores else 1
-            if max_s > 0:
-                scores = [s / max_s for s in new_scores]
-        
+            if max_s <= 0:
+                break
+            new_scores = [s / max_s for s in new_scores]
+            settled = tolerance is not None and max(abs(a - b) for a, b in zip(new_scores, scores)) < tolerance
+            scores = new_scores
+            if settled:
+                break
+        return scores, rounds
+
+    def rank_sentences(self, sentences, scores):
+        n = len(sentences)
         # Add position bias (Earlier sentences are usually more important)
         ranked_sentences = []
         for i, (score, sent) in enumerate(zip(scores, sentences)):
@@ -166,12 +292,51 @@ class SummarizerEngine:
         ranked_sentences.sort(key=lambda x: x[0], reverse=True)
         return ranked_sentences
 
-    def generate_summary(self, url, length='medium'):
+    def generate_summary(self, url, length='medium', incremental=False, boilerplate=None):
+        """
+        Summarizes a URL. Concurrent requests for the same URL and length
+        share a single fetch/parse/rank run and receive the same result;
+        callers in a lane with a deadline (see qos) stop waiting at it.
+
+        incremental: reuse sentence verdicts and the page's previous TextRank
+        state, so re-summarizing a lightly edited page only ranks what changed.
+        boilerplate: learn the site's template and drop its recurring blocks
+        (defaults to the engine's setting).
+        """
+        if boilerplate is None:
+            boilerplate = self.boilerplate
+        key = (canonical_url(url), length, incremental, boilerplate)
+        remaining = qos.remaining()
+        deadline = None if remaining is None else time.monotonic() + remaining
+        try:
+            return get_group('summary').do(
+                key, self._generate_summary, url, length, incremental, boilerplate, deadline=deadline
+            )
+        except CoalesceTimeout as e:
+            # Waiting on another caller's run counts against this lane's deadline
+            raise qos.QueueTimeout(str(e))
+
+    def _generate_summary(self, url, length, incremental=False, boilerplate=False):
         response = self.fetcher.fetch(url)
         if not response:
             return {"error": "Failed to fetch URL"}
 
-        soup = Parser.parse(response.text)
+        # Heavy pages lower parse concurrency instead of piling up trees;
+        # parsing and ranking compete with crawls for CPU (see qos)
+        with PageMemory(url, len(response.content)) as page:
+            try:
+                with get_budget().hold(tree_bytes(page.html_bytes)) as reservation, qos.slot('cpu'):
+                    soup = Parser.parse(response.text)
+                    page.mark('parse')
+                    try:
+                        return self._summarize_page(soup, url, length, incremental, boilerplate, page, reservation)
+                    finally:
+                        # Normally done once extraction ends; this covers early returns
+                        release_tree(soup)
+            finally:
+                self.memory.add(page)
+
+    def _summarize_page(self, soup, url, length, incremental, boilerplate, page, reservation):
         if not soup:
             return {"error": "Failed to parse content"}
 
@@ -182,6 +347,14 @@ class SummarizerEngine:
         elif soup.find('h1'):
             title = soup.find('h1').get_text(" ", strip=True)
 
+        template = None
+        if boilerplate:
+            template = get_template(get_domain(url), self.state_dir)
+            learned = template.learn(soup, url)
+            template.strip(soup)
+            if learned and template.pages % self.TEMPLATE_SAVE_EVERY == 0:
+                template.save()
+
         # Extract Main Content
         # Exclude navigation, footer, sidebar explicitly
         for trash in soup.find_all(['nav', 'footer', 'aside', 'header', 'script', 'style', 'noscript', 'form', 'iframe']):
@@ -218,6 +391,8 @@ class SummarizerEngine:
                 
                 # Strict filter for "list-like" garbage or menu items
                 if len(text.split()) >= 4 and len(text) > 20: 
+                    if template and template.is_boilerplate_text(text):
+                        continue
                     paragraphs.append(text)
         
         full_text = " ".join(paragraphs)
@@ -249,14 +424,37 @@ class SummarizerEngine:
             if not full_text:
                  return {"error": "No significant text or images found to summarize"}
 
+        # Everything needed is in full_text now; free the tree before ranking
+        page.mark('extract')
+        release_tree(soup)
+        page.mark('teardown')
+
         # Smart Sentence Tokenization
-        sentences = self.split_into_sentences(full_text)
+        sentences = self.split_into_sentences(full_text, self.cache if incremental else None)
         
         if not sentences:
              return {"error": "Content too short to summarize"}
 
+        # Ranking needs time and memory quadratic in the sentence count, so
+        # very long pages are ranked on their opening sentences only
+        sentences = sentences[:self.MAX_RANK_SENTENCES]
+
+        # Trade the tree's share of the budget for ranking's, without
+        # holding a CPU slot while waiting for room; never ask for more
+        # than the whole budget
+        budget = get_budget()
+        with qos.released('cpu'):
+            reservation.resize(min(budget.limit, len(sentences) ** 2 * self.RANK_BYTES_PER_PAIR))
+
         # --- TextRank Scoring ---
-        ranked_sentences = self.text_rank_score(sentences)
+        rank_counters = None
+        if incremental:
+            page_key = canonical_url(url)
+            ranked_sentences, state, rank_counters = self.incremental_text_rank(sentences, self.cache.get_page(page_key))
+            self.cache.put_page(page_key, state)
+        else:
+            ranked_sentences = self.text_rank_score(sentences)
+        page.mark('rank')
 
         # --- Output Structuring ---
         if length == 'short':
@@ -332,7 +530,7 @@ class SummarizerEngine:
         if image_fallback:
              exec_text = "[Visual Content Summary] " + exec_text
 
-        return {
+        result = {
             "title": title,
             "executive_summary": exec_text,
             "highlights": final_highlights,
@@ -344,3 +542,6 @@ class SummarizerEngine:
                 "read_time": f"{read_time} min"
             }
         }
+        if rank_counters is not None:
+            result["incremental"] = rank_counters
+        return result
@@ -0,0 +1,74 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+# TextRank state of one page: sentence hashes, their pairwise similarity
+# matrix and the raw (pre position-bias) scores
+RankState = namedtuple('RankState', ['hashes', 'matrix', 'scores'])
+
+
+def sentence_hash(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+
+
+class SummaryCache:
+    """
+    Bounded LRU caches for incremental summarization: per-sentence work
+    (cleaning, quality verdict, token sets) keyed by content hash, and the
+    last TextRank state per page URL.
+    """
+
+    def __init__(self, max_pages=64, max_sentences=50000, max_page_sentences=1500):
+        self.max_pages = max_pages
+        self.max_sentences = max_sentences
+        # Similarity matrices grow quadratically; very long pages aren't kept
+        self.max_page_sentences = max_page_sentences
+        self.pages = OrderedDict()
+        self.sentences = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def memo(self, kind, text, fn):
+        """
+        Returns fn(text), computed once per distinct text and kind.
+        """
+        key = (kind, sentence_hash(text))
+        with self.lock:
+            if key in self.sentences:
+                self.sentences.move_to_end(key)
+                self.hits += 1
+                return self.sentences[key]
+            self.misses += 1
+
+        value = fn(text)
+        with self.lock:
+            self.sentences[key] = value
+            if len(self.sentences) > self.max_sentences:
+                self.sentences.popitem(last=False)
+        return value
+
+    def get_page(self, url):
+        with self.lock:
+            state = self.pages.get(url)
+            if state is not None:
+                self.pages.move_to_end(url)
+            return state
+
+    def put_page(self, url, state):
+        if len(state.hashes) > self.max_page_sentences:
+            return
+        with self.lock:
+            self.pages[url] = state
+            self.pages.move_to_end(url)
+            if len(self.pages) > self.max_pages:
+                self.pages.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'pages': len(self.pages),
+                'sentences': len(self.sentences),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
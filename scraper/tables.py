@@ -0,0 +1,222 @@
+import re
+from datetime import datetime
+
+from bs4 import NavigableString
+
+# HTML caps spans at these values; larger ones are clamped
+MAX_COLSPAN = 1000
+MAX_ROWSPAN = 65534
+
+ROW_GROUPS = ('thead', 'tbody', 'tfoot')
+
+INTEGER = re.compile(r'^[-+]?\d{1,3}(?:,\d{3})+$|^[-+]?\d+$')
+FLOAT = re.compile(r'^[-+]?(?:\d{1,3}(?:,\d{3})+|\d*)\.\d+(?:[eE][-+]?\d+)?$|^[-+]?\d+[eE][-+]?\d+$')
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%d %B %Y', '%d %b %Y', '%B %d, %Y', '%b %d, %Y')
+
+
+def _span(cell, name, limit):
+    try:
+        return min(limit, max(1, int(cell.get(name, 1))))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _rows(table):
+    """
+    Yields (tr, in_thead) for the rows of a table without descending into
+    nested tables.
+    """
+    for child in table.children:
+        name = getattr(child, 'name', None)
+        if name == 'tr':
+            yield child, False
+        elif name in ROW_GROUPS:
+            for tr in child.children:
+                tr_name = getattr(tr, 'name', None)
+                if tr_name == 'tr':
+                    yield tr, name == 'thead'
+                elif tr_name:
+                    yield from _wrapped_rows(tr, table)
+        elif name:
+            yield from _wrapped_rows(child, table)
+
+
+def _wrapped_rows(wrapper, table):
+    """
+    Rows inside some other element, e.g. the <form> legacy pages put
+    around <tr>s, which parsers keep in place.
+    """
+    for tr in wrapper.find_all('tr'):
+        if tr.find_parent('table') is table:
+            yield tr, tr.find_parent(['thead', 'tbody', 'tfoot', 'table']).name == 'thead'
+
+
+def _grid(table):
+    """
+    Expands rowspan/colspan into a rectangular list of text rows.
+    Returns (header_rows, body_rows, first_row_has_th); header_rows are
+    the rows inside <thead>.
+    """
+    head = []
+    rows = []
+    first_has_th = None
+    # column -> [rows still to fill, text] for cells spanning down
+    pending = {}
+    for tr, in_thead in _rows(table):
+        row = []
+        has_th = False
+        for cell in tr.children:
+            name = getattr(cell, 'name', None)
+            if name not in ('td', 'th'):
+                continue
+            has_th = has_th or name == 'th'
+            while len(row) in pending:
+                row.append(_take(pending, len(row)))
+            text = _cell_text(cell)
+            colspan = _span(cell, 'colspan', MAX_COLSPAN)
+            rowspan = _span(cell, 'rowspan', MAX_ROWSPAN)
+            for _ in range(colspan):
+                if rowspan > 1:
+                    pending[len(row)] = [rowspan - 1, text]
+                row.append(text)
+        # Cells spanning into the columns after the last cell of this row.
+        # The rightmost one is found once per row, so the whole grid stays
+        # linear in its number of cells.
+        last = max(pending, default=-1)
+        while len(row) <= last:
+            row.append(_take(pending, len(row)) if len(row) in pending else '')
+
+        if first_has_th is None:
+            first_has_th = has_th
+        (head if in_thead else rows).append(row)
+    return head, rows, bool(first_has_th)
+
+
+def _cell_text(cell):
+    contents = cell.contents
+    # Most cells hold one plain string; skip get_text's tree walk for those
+    if len(contents) == 1 and type(contents[0]) is NavigableString:
+        return contents[0].strip()
+    return cell.get_text(" ", strip=True)
+
+
+def _take(pending, column):
+    entry = pending[column]
+    entry[0] -= 1
+    if entry[0] == 0:
+        del pending[column]
+    return entry[1]
+
+
+def _header(rows):
+    """
+    One header per column; multi-row headers join their distinct parts.
+    """
+    width = max(len(row) for row in rows)
+    headers = []
+    for column in range(width):
+        parts = []
+        for row in rows:
+            value = row[column] if column < len(row) else ''
+            if value and value not in parts:
+                parts.append(value)
+        headers.append(' / '.join(parts))
+    return headers
+
+
+def parse_value(value):
+    """
+    Returns (type, converted) for a cell: 'int', 'float', 'date' (ISO string)
+    or 'str'.
+    """
+    # Codes such as zip codes or IDs keep their leading zeros
+    if len(value) > 1 and value[0] == '0' and value[1].isdigit():
+        return 'str', value
+    if INTEGER.match(value):
+        return 'int', int(value.replace(',', ''))
+    if FLOAT.match(value):
+        return 'float', float(value.replace(',', ''))
+    if value[:1].isdigit() or value[:1].isalpha():
+        for fmt in DATE_FORMATS:
+            try:
+                return 'date', datetime.strptime(value, fmt).date().isoformat()
+            except ValueError:
+                continue
+    return 'str', value
+
+
+def infer_column(values):
+    """
+    Converts a column to its narrowest common type (int < float; date; str).
+    Empty cells become None and don't affect the type.
+    """
+    types = set()
+    converted = []
+    for value in values:
+        if not value:
+            converted.append(None)
+            continue
+        kind, parsed = parse_value(value)
+        if kind == 'str':
+            # Any text cell makes the whole column text; stop parsing
+            return 'str', [value or None for value in values]
+        types.add(kind)
+        converted.append(parsed)
+
+    if not types:
+        return 'empty', converted
+    if types == {'int', 'float'}:
+        return 'float', [None if value is None else float(value) for value in converted]
+    if len(types) == 1:
+        return types.pop(), converted
+    return 'str', [value or None for value in values]
+
+
+def extract_tables(soup, columns=False, infer_types=False):
+    """
+    Extracts every top-level table in one pass over its rows.
+
+    Each table has 'headers' plus either 'rows' (list of row lists) or, with
+    columns=True, 'columns' (one value list per column). With infer_types,
+    numeric and date columns are converted and their types listed in 'types'.
+    """
+    tables = []
+    for table in soup.find_all('table'):
+        # Skip nested tables for cleaner output; their text is part of the outer cell
+        if table.find_parent('table'):
+            continue
+
+        head, body, first_has_th = _grid(table)
+        if any(any(row) for row in head):
+            headers = _header(head)
+        elif body and (first_has_th or len(body) > 1):
+            # Treat first row as header if it has th or if table has multiple rows
+            headers = body[0]
+            body = body[1:]
+        else:
+            headers = []
+
+        # Filter empty rows
+        body = [row for row in body if any(row)]
+
+        # Quality check: only add tables with actual data
+        if not body and len(headers) <= 1:
+            continue
+
+        table_data = {'headers': headers}
+        if columns or infer_types:
+            width = max([len(headers)] + [len(row) for row in body])
+            cols = [[row[i] if i < len(row) else '' for row in body] for i in range(width)]
+            if infer_types:
+                inferred = [infer_column(col) for col in cols]
+                table_data['types'] = [kind for kind, _ in inferred]
+                cols = [values for _, values in inferred]
+            if columns:
+                table_data['columns'] = cols
+                table_data['row_count'] = len(body)
+            else:
+                table_data['rows'] = [list(row) for row in zip(*cols)] if cols else []
+        else:
+            table_data['rows'] = body
+        tables.append(table_data)
+    return tables
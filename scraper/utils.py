@@ -42,3 +42,19 @@ def get_domain(url):
         return urlparse(url).netloc
     except Exception:
         return ""
+
+def canonical_url(url):
+    """
+    Canonical form of a URL for deduplication: lowercase scheme and host,
+    default ports and fragments removed, empty path as '/'.
+    """
+    try:
+        parsed = urlparse(url.strip())
+    except (AttributeError, ValueError):
+        return url
+
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    return parsed._replace(scheme=scheme, netloc=netloc, path=parsed.path or '/', fragment='').geturl()
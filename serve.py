@@ -0,0 +1,280 @@
+import argparse
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from scraper.runtime import process_memory, proportional_memory
+
+logger = logging.getLogger('serve')
+
+# A worker that dies sooner than this after starting is not respawned
+# immediately, so a broken deploy does not fork in a tight loop
+RESPAWN_BACKOFF = 1.0
+
+
+class RequestHandler(WSGIRequestHandler):
+    # One request per connection: an idle keep-alive socket would hold one of
+    # the worker's few threads. Put a reverse proxy in front for keep-alive.
+    protocol_version = 'HTTP/1.0'
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    WSGI server on an inherited listening socket that handles requests on
+    a fixed pool of threads. While every thread is busy it stops accepting,
+    leaving new connections in the shared backlog for idle workers.
+    """
+
+    multithread = True
+
+    # Longest wait for a free thread before serve_forever() checks for shutdown
+    SLOT_WAIT = 0.5
+
+    def __init__(self, host, port, app, threads, fd):
+        super().__init__(host, port, app, handler=RequestHandler, fd=fd)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+        self.slots = threading.BoundedSemaphore(threads)
+        # Every worker is woken by a new connection and only one gets it;
+        # the others must not block in accept()
+        self.socket.setblocking(False)
+
+    def _handle_request_noblock(self):
+        # Take a thread before accepting, so the connection stays in the
+        # backlog for another worker while every thread here is busy
+        if not self.slots.acquire(timeout=self.SLOT_WAIT):
+            return
+        try:
+            request, client_address = self.get_request()
+        except OSError:
+            self.slots.release()
+            return
+        request.setblocking(True)
+        try:
+            self.pool.submit(self._process, request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+
+def run_worker(web, listener, args, report_fd):
+    """
+    Body of a worker: warm up, report to the master through `report_fd`,
+    then serve until SIGTERM.
+    """
+    forked = time.perf_counter()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    web.warm_up.run(web.warm_up_steps())
+    server = PooledWSGIServer(args.host, args.port, web.app, args.threads, listener.fileno())
+    listener.close()
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever() to return, so not from this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+
+    rss, _ = process_memory()
+    ready_ms = (time.perf_counter() - forked) * 1000
+    if report_fd is None:
+        logger.info(f"Serving, {web.warm_up.state} in {ready_ms:.0f} ms, RSS {rss / (1024 * 1024):.1f} MB")
+    else:
+        os.write(report_fd, f"{os.getpid()} {ready_ms:.1f} {rss} {web.warm_up.state}\n".encode('ascii'))
+        os.close(report_fd)
+
+    server.serve_forever()
+    server.server_close()
+    # Lets in-flight requests finish
+    server.pool.shutdown(wait=True)
+
+
+class Master:
+    """
+    Pre-fork master. Binds the socket and imports the app once, so workers
+    share the loaded code copy-on-write, then forks `workers` processes and
+    keeps that many running until SIGTERM/SIGINT. Engines, pools and threads
+    are only created inside workers (threads do not survive fork).
+    """
+
+    def __init__(self, web, listener, args):
+        self.web = web
+        self.listener = listener
+        self.args = args
+        self.workers = {}
+        self.ready = set()
+        self.stopping = False
+        self.all_ready_logged = False
+        self.report_fd, self.write_fd = os.pipe()
+        self.buffer = b''
+
+    def run(self, started):
+        self.started = started
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.args.workers):
+            self.spawn()
+
+        while not self.stopping:
+            self._read_reports()
+            self._reap()
+            self._maintain()
+        self._shutdown()
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                os.close(self.report_fd)
+                run_worker(self.web, self.listener, self.args, self.write_fd)
+            except BaseException:
+                logger.exception("Worker failed")
+                code = 1
+            finally:
+                # Never return into the master's loop
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+        return pid
+
+    def _read_reports(self):
+        try:
+            readable, _, _ = select.select([self.report_fd], [], [], 0.5)
+        except InterruptedError:
+            return
+        if not readable:
+            return
+        self.buffer += os.read(self.report_fd, 4096)
+        *lines, self.buffer = self.buffer.split(b'\n')
+        for line in lines:
+            pid, ready_ms, rss, state = line.decode('ascii').split()
+            self.ready.add(int(pid))
+            logger.info(
+                f"Worker {pid} {state} in {float(ready_ms):.0f} ms after fork, "
+                f"RSS {int(rss) / (1024 * 1024):.1f} MB"
+            )
+        if not self.all_ready_logged and len(self.ready & set(self.workers)) >= self.args.workers:
+            self.all_ready_logged = True
+            logger.info(f"{self.args.workers} workers ready {time.perf_counter() - self.started:.2f}s after start; "
+                        f"{self.memory_summary()}")
+
+    def memory_summary(self):
+        shares = [proportional_memory(pid) for pid in self.workers]
+        if all(share is not None for share in shares):
+            return f"proportional memory {sum(shares) / len(shares) / (1024 * 1024):.1f} MB per worker"
+        rss = [process_memory(pid)[0] for pid in self.workers]
+        return f"RSS {sum(rss) / len(rss) / (1024 * 1024):.1f} MB per worker (shared pages counted in each)"
+
+    def _reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            self.ready.discard(pid)
+            if started is not None and not self.stopping:
+                code = os.waitstatus_to_exitcode(status)
+                logger.warning(f"Worker {pid} exited with code {code}")
+                if time.monotonic() - started < RESPAWN_BACKOFF:
+                    time.sleep(RESPAWN_BACKOFF)
+
+    def _maintain(self):
+        while not self.stopping and len(self.workers) < self.args.workers:
+            self.spawn()
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+    def _shutdown(self):
+        logger.info(f"Stopping {len(self.workers)} workers")
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.args.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for pid in list(self.workers):
+            logger.warning(f"Killing worker {pid} after {self.args.graceful_timeout}s")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self.workers:
+            self._reap()
+            time.sleep(0.05)
+        self.listener.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Production server for the scraper app: pre-forked workers, each with a thread pool."
+    )
+    parser.add_argument('--host', default=os.environ.get('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1)),
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 8)),
+                        help="request threads per worker")
+    parser.add_argument('--backlog', type=int, default=2048, help="listen backlog shared by all workers")
+    parser.add_argument('--graceful-timeout', type=float, default=30,
+                        help="seconds workers get to finish in-flight requests on shutdown")
+    parser.add_argument('--access-log', action='store_true', help="log every request")
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.threads < 1:
+        parser.error("--workers and --threads must be at least 1")
+    return args
+
+
+def main(argv=None):
+    started = time.perf_counter()
+    args = parse_args(argv)
+
+    # Imported after parsing so --help stays instant; timed, since every
+    # restart pays for it before the first worker forks
+    import app as web
+
+    if not args.access_log:
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    rss, _ = process_memory()
+    logger.info(f"Imported app in {(time.perf_counter() - started) * 1000:.0f} ms, "
+                f"master RSS {rss / (1024 * 1024):.1f} MB")
+
+    listener = socket.create_server((args.host, args.port), backlog=args.backlog)
+    args.port = listener.getsockname()[1]
+    logger.info(f"Listening on http://{args.host}:{args.port} with {args.workers} workers x {args.threads} threads")
+
+    if not hasattr(os, 'fork'):
+        # No pre-forking on this platform: one process with the thread pool
+        run_worker(web, listener, args, None)
+        return 0
+
+    Master(web, listener, args).run(started)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import unittest
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+from scraper import export
+from scraper.export import create_exporter, find_export, prune_exports
+
+PAGE = {
+    'url': 'https://example.com/',
+    'title': 'Example',
+    'paragraphs': ['First paragraph of the page.', 'Second paragraph of the page.'],
+    'links': [{'text': 'About', 'href': 'https://example.com/about', 'type': 'internal', 'context': 'nav'}],
+    'tables': [{'headers': ['Name', 'Value'], 'rows': [['alpha', '1'], ['beta', '2']]}],
+}
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.export_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.export_dir, ignore_errors=True)
+
+    def test_ndjson_gzip_round_trip(self):
+        with create_exporter('ndjson.gz', self.export_dir) as exporter:
+            exporter.write(PAGE)
+            exporter.write(dict(PAGE, url='https://example.com/2'))
+
+        self.assertEqual(find_export(exporter.export_id, self.export_dir), exporter.path)
+        with gzip.open(exporter.path, 'rt', encoding='utf-8') as handle:
+            pages = [json.loads(line) for line in handle]
+        self.assertEqual(pages[0], PAGE)
+        self.assertEqual(len(pages), 2)
+
+    def test_csv_flattens_sections(self):
+        exporter = create_exporter('csv', self.export_dir)
+        exporter.write(PAGE)
+        exporter.close()
+
+        with zipfile.ZipFile(exporter.path) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()),
+                ['links.csv', 'pages.csv', 'paragraphs.csv', 'tables.csv']
+            )
+            rows = list(csv.DictReader(io.TextIOWrapper(archive.open('tables.csv'), encoding='utf-8')))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[3]['header'], 'Value')
+        self.assertEqual(rows[3]['value'], '2')
+
+    @unittest.skipIf(export.optional_module('pyarrow') is None, "pyarrow is not installed")
+    def test_parquet_columns(self):
+        exporter = create_exporter('parquet', self.export_dir)
+        exporter.write(PAGE)
+        exporter.close()
+
+        with zipfile.ZipFile(exporter.path) as archive:
+            table = export.optional_module('pyarrow.parquet').read_table(io.BytesIO(archive.read('paragraphs.parquet')))
+        self.assertEqual(table.column('position').to_pylist(), [0, 1])
+
+    @unittest.skipIf(export.optional_module('pyarrow') is None, "pyarrow is not installed")
+    def test_parquet_accepts_typed_table_cells(self):
+        # table_types turns cells into ints/floats; the value column stays text
+        typed = dict(PAGE, tables=[{'headers': ['Name', 'Value'], 'types': ['str', 'int'],
+                                    'rows': [['alpha', 1], ['beta', None]]}])
+        exporter = create_exporter('parquet', self.export_dir)
+        exporter.write(typed)
+        exporter.close()
+
+        with zipfile.ZipFile(exporter.path) as archive:
+            table = export.optional_module('pyarrow.parquet').read_table(io.BytesIO(archive.read('tables.parquet')))
+        self.assertEqual(table.column('value').to_pylist(), ['alpha', '1', 'beta', None])
+
+    def test_unfinished_export_is_not_served(self):
+        exporter = create_exporter('ndjson', self.export_dir)
+        exporter.write(PAGE)
+        self.assertIsNone(find_export(exporter.export_id, self.export_dir))
+        exporter.close()
+        self.assertEqual(find_export(exporter.export_id, self.export_dir), exporter.path)
+
+        aborted = create_exporter('csv', self.export_dir)
+        aborted.write(PAGE)
+        aborted.abort()
+        self.assertEqual(os.listdir(self.export_dir), [os.path.basename(exporter.path)])
+
+    def test_old_exports_are_pruned(self):
+        with create_exporter('ndjson', self.export_dir) as old:
+            old.write(PAGE)
+        os.utime(old.path, (0, 0))
+        with create_exporter('ndjson', self.export_dir) as recent:
+            recent.write(PAGE)
+
+        self.assertIsNone(find_export(old.export_id, self.export_dir))
+        self.assertEqual(find_export(recent.export_id, self.export_dir), recent.path)
+
+    def test_pruning_leaves_other_files_alone(self):
+        # The export directory may be shared with unrelated data
+        other_file = os.path.join(self.export_dir, 'notes.txt')
+        other_dir = os.path.join(self.export_dir, 'data')
+        stale_part = os.path.join(self.export_dir, f".{'a' * 32}.ndjson.part")
+        stale_work = os.path.join(self.export_dir, f".{'b' * 32}-k3x_9q")
+        os.mkdir(other_dir)
+        os.mkdir(stale_work)
+        for path in (other_file, os.path.join(other_dir, 'rows.csv'), stale_part):
+            with open(path, 'w') as handle:
+                handle.write('x')
+        for path in (other_file, other_dir, os.path.join(other_dir, 'rows.csv'), stale_part, stale_work):
+            os.utime(path, (0, 0))
+
+        self.assertEqual(prune_exports(self.export_dir), 2)
+        self.assertEqual(sorted(os.listdir(self.export_dir)), ['data', 'notes.txt'])
+
+    def test_unknown_format_and_bad_id(self):
+        with self.assertRaises(ValueError):
+            create_exporter('xml', self.export_dir)
+        self.assertIsNone(find_export('../app', self.export_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from loadtest.__main__ import serve_app
+from loadtest.runner import LoadRunner, compare, percentile
+from loadtest.site import StandInSite
+from scraper import state
+
+
+class TestLoadTest(unittest.TestCase):
+
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_run_against_stand_in_site(self):
+        # Keep anything the app learns out of the working directory
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir, ignore_errors=True)
+        patcher = mock.patch.object(state, 'STATE_DIR', state_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        target, server = serve_app()
+        self.addCleanup(server.shutdown)
+        with StandInSite(latency_ms=5, page_kb=4) as site:
+            result = LoadRunner(
+                target, site.url, mix={'summarize': 1, 'health': 1}, concurrency=2, duration=1, seed=1
+            ).run()
+
+        self.assertGreater(result['overall']['requests'], 0)
+        self.assertEqual(result['overall']['errors'], 0)
+        self.assertLessEqual(result['overall']['p50_ms'], result['overall']['p99_ms'])
+        self.assertGreater(result['process']['peak_threads'], 1)
+
+        rows = compare(result, result)
+        self.assertTrue(all(verdict == 'same' for *_, verdict in rows))
+
+    def test_unknown_endpoint_rejected(self):
+        with self.assertRaises(ValueError):
+            LoadRunner('http://127.0.0.1:1', 'http://127.0.0.1:2', mix={'upload': 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
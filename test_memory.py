@@ -0,0 +1,128 @@
+import threading
+import time
+import tracemalloc
+import unittest
+
+from scraper.memory import MemoryBudget, MemoryStats, PageMemory, release_tree, tree_bytes, TREE_FACTOR
+from scraper.parser import Parser
+from scraper import qos
+
+
+class TestMemoryBudget(unittest.TestCase):
+
+    def test_heavy_pages_wait_for_room(self):
+        budget = MemoryBudget(limit=100)
+        order = []
+
+        def parse(name, nbytes):
+            with budget.hold(nbytes):
+                order.append(name)
+                time.sleep(0.05)
+
+        budget.reserve(80)
+        second = threading.Thread(target=parse, args=('second', 50))
+        second.start()
+        time.sleep(0.05)
+        self.assertEqual(order, [])
+        self.assertEqual(budget.stats()['waiting'], 1)
+
+        budget.release(80)
+        second.join(1)
+        self.assertEqual(order, ['second'])
+        self.assertEqual(budget.stats()['throttled'], 1)
+        self.assertEqual(budget.stats()['pages_in_flight'], 0)
+
+    def test_oversized_page_is_admitted_alone(self):
+        budget = MemoryBudget(limit=10 * TREE_FACTOR)
+        # Larger than the whole budget, but nothing else is in flight
+        with budget.hold(tree_bytes(1000)):
+            self.assertEqual(budget.stats()['pages_in_flight'], 1)
+            self.assertEqual(budget.stats()['throttled'], 0)
+
+    def test_waiting_stops_at_lane_deadline(self):
+        budget = MemoryBudget(limit=100)
+        with budget.hold(100):
+            with qos.lane(qos.INTERACTIVE, deadline=0.05):
+                with self.assertRaises(qos.QueueTimeout):
+                    budget.reserve(1)
+        self.assertEqual(budget.in_flight, 0)
+        self.assertEqual(budget.stats()['waiting'], 0)
+
+    def test_growing_reservation_waits_for_others(self):
+        budget = MemoryBudget(limit=100)
+        grown = threading.Event()
+
+        def summarize():
+            with budget.hold(10) as reservation:
+                reservation.resize(90)
+                grown.set()
+
+        with budget.hold(50):
+            thread = threading.Thread(target=summarize)
+            thread.start()
+            self.assertFalse(grown.wait(0.1))
+            # While it waits, its old share is free for others
+            self.assertEqual(budget.in_flight, 50)
+        thread.join(1)
+        self.assertTrue(grown.is_set())
+        self.assertEqual(budget.stats()['pages_in_flight'], 0)
+        self.assertEqual(budget.in_flight, 0)
+
+    def test_growing_reservation_is_not_starved_by_bulk_pages(self):
+        budget = MemoryBudget(limit=100)
+        stop = threading.Event()
+
+        def crawl():
+            # Bulk pages that would each fit next to the others
+            while not stop.is_set():
+                with budget.hold(30):
+                    time.sleep(0.01)
+
+        crawlers = [threading.Thread(target=crawl) for _ in range(3)]
+        for thread in crawlers:
+            thread.start()
+        self.addCleanup(lambda: [stop.set()] + [thread.join() for thread in crawlers])
+        time.sleep(0.05)
+
+        started = time.monotonic()
+        with qos.lane(qos.INTERACTIVE, deadline=2):
+            with budget.hold(5) as reservation:
+                reservation.resize(95)
+                self.assertEqual(budget.in_flight, 95)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_release_tree_is_idempotent(self):
+        soup = Parser.parse("<html><body><p>One</p><p>Two</p></body></html>")
+        release_tree(soup)
+        self.assertTrue(soup.decomposed)
+        release_tree(soup)
+        release_tree(None)
+
+
+class TestPageMemory(unittest.TestCase):
+
+    def test_one_page_traced_at_a_time(self):
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        stats = MemoryStats()
+
+        with PageMemory('https://example.com/a', 1000) as first:
+            with PageMemory('https://example.com/b', 1000) as second:
+                data = [bytes(100000)]
+                second.mark('parse')
+            first.mark('parse')
+            del data
+        self.assertTrue(first.tracing)
+        self.assertFalse(second.tracing)
+        self.assertGreaterEqual(first.peak, 100000)
+
+        stats.add(first)
+        stats.add(second)
+        self.assertEqual((stats.stats()['pages'], stats.stats()['traced_pages']), (2, 1))
+        # The next page is traced again
+        with PageMemory('https://example.com/c', 1000) as third:
+            self.assertTrue(third.tracing)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from scraper.parser import Parser
+from scraper.filters import ContentFilter
+
+PAGE = """
+<html>
+<head>
+    <title>Sample Page</title>
+    <meta name="description" content="A page used for parser tests.">
+</head>
+<body>
+    <nav><a href="/home">Home</a></nav>
+    <h1>Main Heading</h1>
+    <p>This paragraph is long enough to be kept by the filter.</p>
+    <table>
+        <tr><th>Name</th><th>Value</th></tr>
+        <tr><td>alpha</td><td>1</td></tr>
+    </table>
+    <img src="/hero.png" alt="Hero">
+    <a href="/about">About us</a>
+</body>
+</html>
+"""
+
+
+class TestPartialParsing(unittest.TestCase):
+
+    def extract_both(self, sections, follow_links=True):
+        content_filter = ContentFilter(sections)
+        full = Parser.parse(PAGE)
+        partial = Parser.parse(PAGE, sections=sections, follow_links=follow_links)
+        url = "https://example.com/"
+        return content_filter.extract(full, url), content_filter.extract(partial, url), partial
+
+    def test_head_only(self):
+        sections = {'title': True, 'meta_description': True}
+        full, partial, soup = self.extract_both(sections, follow_links=False)
+        self.assertEqual(full, partial)
+        self.assertIsNone(soup.find('body'))
+
+    def test_head_only_falls_back_to_h1(self):
+        page = PAGE.replace("<title>Sample Page</title>", "")
+        soup = Parser.parse(page, sections={'title': True}, follow_links=False)
+        self.assertEqual(ContentFilter({'title': True}).extract(soup)['title'], "Main Heading")
+
+    def test_strained_sections_match_full_tree(self):
+        sections = {'headings': True, 'paragraphs': True, 'tables': True, 'images': True}
+        full, partial, soup = self.extract_both(sections)
+        self.assertEqual(full, partial)
+        self.assertEqual(
+            Parser.extract_links(soup, "https://example.com/"),
+            Parser.extract_links(Parser.parse(PAGE), "https://example.com/")
+        )
+
+    def test_links_section_needs_full_tree(self):
+        self.assertIsNone(Parser.strainer_tags({'links', 'title'}))
+        full, partial, _ = self.extract_both({'links': True})
+        self.assertEqual(full, partial)
+
+
+if __name__ == "__main__":
+    unittest.main()
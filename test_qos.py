@@ -0,0 +1,87 @@
+import threading
+import time
+import unittest
+
+from scraper import qos
+from scraper.qos import LaneScheduler, QueueTimeout, INTERACTIVE, BULK
+
+
+class TestLaneScheduler(unittest.TestCase):
+
+    def test_bulk_leaves_reserved_slots_free(self):
+        scheduler = LaneScheduler('cpu', capacity=2, reserved=1)
+        scheduler.acquire(BULK)
+        with self.assertRaises(QueueTimeout):
+            scheduler.acquire(BULK, deadline=time.monotonic() + 0.05)
+        # The reserved slot is still there for interactive work
+        scheduler.acquire(INTERACTIVE, deadline=time.monotonic() + 0.05)
+
+        lanes = scheduler.stats()['lanes']
+        self.assertEqual(lanes[BULK]['in_use'], 1)
+        self.assertEqual(lanes[BULK]['timeouts'], 1)
+        self.assertEqual(lanes[INTERACTIVE]['admitted'], 1)
+
+    def test_freed_slot_goes_to_interactive_first(self):
+        scheduler = LaneScheduler('fetch', capacity=2, reserved=0)
+        scheduler.acquire(BULK)
+        scheduler.acquire(BULK)
+        order = []
+
+        def worker(lane_name):
+            scheduler.acquire(lane_name)
+            order.append(lane_name)
+
+        bulk = threading.Thread(target=worker, args=(BULK,))
+        bulk.start()
+        time.sleep(0.05)
+        interactive = threading.Thread(target=worker, args=(INTERACTIVE,))
+        interactive.start()
+        time.sleep(0.05)
+
+        scheduler.release(BULK)
+        interactive.join(1)
+        self.assertEqual(order, [INTERACTIVE])
+        scheduler.release(BULK)
+        bulk.join(1)
+        self.assertEqual(order, [INTERACTIVE, BULK])
+        self.assertGreater(scheduler.stats()['lanes'][INTERACTIVE]['wait_max_ms'], 0)
+
+    def test_interactive_deadline(self):
+        scheduler = LaneScheduler('cpu', capacity=1, reserved=0)
+        scheduler.acquire(BULK)
+        with qos.lane(INTERACTIVE, deadline=0.05):
+            self.assertLessEqual(qos.remaining(), 0.05)
+            with self.assertRaises(QueueTimeout):
+                with scheduler.slot():
+                    pass
+        self.assertIsNone(qos.remaining())
+        self.assertEqual(qos.current_lane(), BULK)
+
+    def test_released_slot_is_taken_back(self):
+        scheduler = LaneScheduler('cpu', capacity=1, reserved=0)
+        with scheduler.slot():
+            with scheduler.released():
+                # Another thread can use the slot while this one waits on I/O
+                other = threading.Thread(target=lambda: (scheduler.acquire(BULK), scheduler.release(BULK)))
+                other.start()
+                other.join(1)
+                self.assertFalse(other.is_alive())
+            self.assertEqual(scheduler.stats()['lanes'][BULK]['in_use'], 1)
+        self.assertEqual(scheduler.stats()['lanes'][BULK]['in_use'], 0)
+
+
+    def test_taking_slot_back_respects_deadline(self):
+        scheduler = LaneScheduler('cpu', capacity=1, reserved=0)
+        with qos.lane(INTERACTIVE, deadline=0.1):
+            with self.assertRaises(QueueTimeout):
+                with scheduler.slot():
+                    with scheduler.released():
+                        # Someone else takes the slot during the wait
+                        scheduler.acquire(BULK)
+        # The slot that could not be taken back is not released twice
+        self.assertEqual(scheduler.stats()['lanes'][BULK]['in_use'], 1)
+        self.assertEqual(scheduler.stats()['lanes'][INTERACTIVE]['in_use'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,430 @@
+import unittest
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from unittest import mock
+
+from scraper.scraper import ScraperEngine
+from scraper.frontier import Frontier, LinkScorer
+from scraper.http_client import get_client, DNS_CACHE, HttpClient, PREWARM_TTL
+from scraper.fetcher import Fetcher, FetchError
+from scraper.singleflight import get_group
+from scraper.boilerplate import TemplateIndex
+from scraper.filters import ContentFilter
+from scraper.parser import Parser
+from scraper.memory import PageMemory
+from scraper.state import StateStore
+from scraper.search import get_index
+from scraper.images import ImageProber, image_size, MAX_CONCURRENT_PROBES, MAX_QUEUED_PROBES
+
+
+def make_page(title, body):
+    return f"<html><head><title>{title}</title></head><body>{body}</body></html>"
+
+
+PAGES = {
+    '/': make_page("Home", """
+        <footer><a href="/privacy">Privacy policy</a> <a href="/terms">Terms</a></footer>
+        <nav><a href="/account/login">Log in</a></nav>
+        <main><a href="/articles/guide">A complete guide to crawling</a></main>
+    """),
+    '/articles/guide': make_page("Guide", "<p>The guide explains how crawlers pick pages.</p>"),
+    '/privacy': make_page("Privacy", "<p>Privacy text.</p>"),
+    '/terms': make_page("Terms", "<p>Terms text.</p>"),
+    '/account/login': make_page("Login", "<p>Login form.</p>"),
+    '/flaky/': make_page("Flaky", '<main><a href="/articles/guide">Read the guide</a></main>'),
+    '/slow/': make_page("Slow", '<main><a href="/slow/next">Next slow page</a></main>'),
+    '/slow/next': make_page("Slow next", ""),
+    '/gallery': make_page("Gallery", '<img src="/img/pixel.gif" alt="tracking pixel"><img src="/img/photo.png" alt="Photo of the team">'),
+}
+
+# Image bodies; a real PNG header followed by padding the probe should not read
+IMAGES = {
+    '/img/pixel.gif': b'GIF89a\x01\x00\x01\x00\x80\x00\x00' + b'\x00' * 20,
+    '/img/photo.png': b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x02\x80\x00\x00\x01\xe0' + b'\x00' * 100000,
+}
+RANGE_HEADERS = []
+
+FLAKY_HITS = []
+
+# Cookie header received by /session/check, per request
+SESSION_COOKIES = []
+
+# lastmod per path listed in /sitemap.xml.gz
+SITEMAP = {
+    '/articles/guide': '2025-01-01',
+    '/privacy': '2025-01-01',
+    '/account/login': '2025-01-01',
+}
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/flaky/':
+            FLAKY_HITS.append(self.path)
+            if len(FLAKY_HITS) == 1:
+                self.send_response(503)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+        if self.path == '/slow/next':
+            time.sleep(1.0)
+        if self.path == '/session/start':
+            self.send_response(200)
+            self.send_header('Set-Cookie', 'sid=first; Path=/')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path == '/session/check':
+            SESSION_COOKIES.append(self.headers.get('Cookie'))
+            return self.send_body("ok", 'text/plain')
+        if self.path == '/robots.txt':
+            origin = f"http://{self.headers['Host']}"
+            return self.send_body(f"User-agent: *\nDisallow: /account/\nSitemap: {origin}/sitemap.xml.gz\n", 'text/plain')
+        if self.path == '/sitemap.xml.gz':
+            origin = f"http://{self.headers['Host']}"
+            urls = ''.join(
+                f"<url><loc>{origin}{path}</loc><lastmod>{lastmod}</lastmod></url>"
+                for path, lastmod in SITEMAP.items()
+            )
+            xml = f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+            return self.send_body(gzip.compress(xml.encode('utf-8')), 'application/gzip')
+        if self.path in IMAGES:
+            RANGE_HEADERS.append(self.headers.get('Range'))
+            body = IMAGES[self.path]
+            start, _, end = (self.headers.get('Range') or 'bytes=0-').split('=')[1].partition('-')
+            return self.send_body(body[int(start):int(end) + 1 if end else None], 'image/png')
+        body = PAGES.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_body(body, 'text/html; charset=utf-8')
+
+    def send_body(self, body, content_type):
+        payload = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestScraperEngine(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), SiteHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}/"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def config(self, **overrides):
+        config = {
+            'max_pages': 2,
+            'depth': 2,
+            'links_per_page': 5,
+            'sections': {'title': True},
+        }
+        config.update(overrides)
+        return config
+
+    def test_best_first_expands_content_links(self):
+        results = ScraperEngine(self.base_url, self.config()).run()
+        titles = {page['title'] for page in results}
+        self.assertEqual(titles, {"Home", "Guide"})
+
+    def test_scorer_ranks_content_above_footer(self):
+        frontier = Frontier(LinkScorer())
+        content = {'url': 'http://site/articles/post', 'text': 'Read the full post', 'context': 'content'}
+        footer = {'url': 'http://site/privacy', 'text': 'Privacy policy', 'context': 'footer'}
+        frontier.offer([footer, content], depth=2, limit=2)
+        self.assertEqual(frontier.pop()[0], content['url'])
+
+    def test_failed_fetch_is_retried_from_frontier(self):
+        engine = ScraperEngine(self.base_url + "flaky/", self.config())
+        engine.fetcher.backoff_factor = 0.05
+        results = engine.run()
+        self.assertEqual([page['title'] for page in results], ["Flaky", "Guide"])
+        self.assertEqual(engine.retries, 1)
+        self.assertEqual(engine.stop_reason, 'max_pages')
+
+    def test_time_budget_returns_partial_results(self):
+        engine = ScraperEngine(self.base_url + "slow/", self.config(max_seconds=0.3))
+        started = time.monotonic()
+        results = engine.run()
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertEqual([page['title'] for page in results], ["Slow"])
+        self.assertEqual(engine.stop_reason, 'time_budget')
+
+    def test_byte_budget_stops_crawl(self):
+        engine = ScraperEngine(self.base_url, self.config(max_pages=5, max_bytes=10))
+        results = engine.run()
+        self.assertEqual(len(results), 1)
+        self.assertEqual(engine.stop_reason, 'byte_budget')
+
+    def test_engines_share_pooled_connections(self):
+        client = get_client()
+        ScraperEngine(self.base_url, self.config()).run()
+        before = client.stats()
+        ScraperEngine(self.base_url, self.config()).run()
+        after = client.stats()
+        self.assertEqual(after['requests'] - before['requests'], 2)
+        self.assertEqual(after['connections_opened'], before['connections_opened'])
+        self.assertGreater(after['dns']['hits'] + after['dns']['misses'], 0)
+
+    def test_cookies_stay_with_their_fetcher(self):
+        first, second = Fetcher(), Fetcher()
+        first.get(self.base_url + "session/start")
+        first.get(self.base_url + "session/check")
+        second.get(self.base_url + "session/check")
+        self.assertEqual(SESSION_COOKIES[-2:], ['sid=first', None])
+
+    def test_connect_falls_back_to_next_address(self):
+        # Only 127.0.0.1 listens; the first cached address refuses
+        port = self.server.server_address[1]
+        DNS_CACHE.entries[('localhost', port)] = (time.monotonic() + 60, ['127.0.0.2', '127.0.0.1'])
+        self.addCleanup(DNS_CACHE.invalidate, 'localhost', port)
+        response = Fetcher().get(f"http://localhost:{port}/privacy")
+        self.assertIn("Privacy text.", response.text)
+
+    def test_prewarmed_origins_expire(self):
+        client = HttpClient()
+        warmed = []
+        client.prewarm_executor.submit = lambda warm, origin: warmed.append(origin)
+        client.prewarm(["https://example.com/a", "https://example.com/b"])
+        self.assertEqual(warmed, ["https://example.com"])
+
+        # Idle connections are gone by now; the origin can be warmed again
+        client.warm_hosts["https://example.com"] -= PREWARM_TTL
+        self.assertEqual(client.stats()['prewarmed_hosts'], 0)
+        client.prewarm(["https://example.com/c"])
+        self.assertEqual(warmed, ["https://example.com"] * 2)
+
+    def test_incremental_sitemap_recrawl(self):
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir, ignore_errors=True)
+
+        def crawl():
+            config = self.config(mode='sitemap', incremental=True, depth=1, max_pages=10, state_dir=state_dir)
+            engine = ScraperEngine(self.base_url, config)
+            results = engine.run()
+            return engine, sorted(page['title'] for page in results)
+
+        first, titles = crawl()
+        self.assertEqual(titles, ["Guide", "Home", "Privacy"])
+        self.assertEqual(first.robots_blocked, 1)
+        self.assertEqual(first.sitemap_urls, 3)
+
+        self.addCleanup(SITEMAP.__setitem__, '/privacy', SITEMAP['/privacy'])
+        SITEMAP['/privacy'] = '2025-06-01T10:00:00Z'
+        second, titles = crawl()
+        self.assertEqual(titles, ["Home", "Privacy"])
+        self.assertEqual(second.skipped_unchanged, 1)
+        self.assertEqual(second.robots_blocked, 1)
+
+    def test_delta_reports_only_changes(self):
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir, ignore_errors=True)
+        original = PAGES['/articles/guide']
+        self.addCleanup(PAGES.__setitem__, '/articles/guide', original)
+
+        def crawl():
+            sections = {'title': True, 'paragraphs': True}
+            engine = ScraperEngine(self.base_url, self.config(sections=sections, delta=True, state_dir=state_dir))
+            engine.run()
+            return engine.delta
+
+        first = crawl()
+        PAGES['/articles/guide'] = make_page("Guide", "<p>The guide now covers politeness rules too.</p>")
+        second = crawl()
+
+        self.assertEqual(len(first['added']), 2)
+        self.assertEqual(second['added'], [])
+        self.assertEqual(second['unchanged'], 1)
+        self.assertEqual(len(second['changed']), 1)
+        self.assertEqual(list(second['changed'][0]['sections']), ['paragraphs'])
+
+    def test_delta_keeps_sections_a_run_skipped(self):
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir, ignore_errors=True)
+
+        def crawl(**sections):
+            engine = ScraperEngine(self.base_url, self.config(sections=sections, delta=True, state_dir=state_dir))
+            engine.run()
+            return engine.delta
+
+        crawl(title=True, paragraphs=True)
+        crawl(title=True)
+        third = crawl(title=True, paragraphs=True)
+        self.assertEqual(third['changed'], [])
+        self.assertEqual(third['unchanged'], 2)
+
+    def test_concurrent_identical_fetches_are_coalesced(self):
+        group = get_group('fetch')
+        before = group.stats()
+        url = self.base_url + "slow/next"
+        responses = []
+        threads = [
+            threading.Thread(target=lambda: responses.append(Fetcher().get(url)))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        after = group.stats()
+        # One download, but every caller gets its own response object
+        self.assertEqual(len({id(response) for response in responses}), 3)
+        self.assertEqual({response.text for response in responses}, {PAGES['/slow/next']})
+        self.assertEqual(after['executed'] - before['executed'], 1)
+        self.assertEqual(after['coalesced'] - before['coalesced'], 2)
+
+    def test_coalesced_fetch_respects_caller_timeout(self):
+        url = self.base_url + "slow/next"
+        leader = threading.Thread(target=Fetcher().get, args=(url,))
+        leader.start()
+        self.addCleanup(leader.join)
+        time.sleep(0.1)
+
+        started = time.monotonic()
+        with self.assertRaises(FetchError) as caught:
+            Fetcher().get(url, timeout=0.2)
+        self.assertLess(time.monotonic() - started, 0.6)
+        self.assertTrue(caught.exception.retryable)
+
+    def test_boilerplate_learned_across_pages(self):
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir, ignore_errors=True)
+        chrome = """
+            <div class="cookie-banner"><p>We use cookies to improve your experience here.</p></div>
+            <p>Copyright 2025 Example Media, all rights reserved.</p>
+        """
+        template = TemplateIndex('site', StateStore('templates', state_dir))
+        content_filter = ContentFilter({'paragraphs': True})
+
+        def extract(topic):
+            soup = Parser.parse(make_page(topic, f"{chrome}<p>This article is all about {topic} today.</p>"))
+            template.learn(soup)
+            template.strip(soup)
+            return content_filter.extract(soup, template=template)['paragraphs']
+
+        self.assertEqual(len(extract("crawlers")), 3)
+        self.assertEqual(len(extract("parsers")), 3)
+        self.assertEqual(extract("sitemaps"), ["This article is all about sitemaps today."])
+        self.assertEqual(template.stats()['blocks_removed'], 1)
+        self.assertEqual(template.stats()['texts_skipped'], 1)
+
+        template.save()
+        reloaded = TemplateIndex('site', StateStore('templates', state_dir))
+        soup = Parser.parse(make_page("Robots", chrome))
+        self.assertEqual(reloaded.strip(soup), 1)
+
+    def test_settled_template_samples_new_pages(self):
+        template = TemplateIndex('site')
+        chrome = "<footer><p>Copyright 2025 Example Media, all rights reserved.</p></footer>"
+        learned = [
+            template.learn(Parser.parse(make_page(f"Topic {n}", chrome)), f"https://site.test/{n}")
+            for n in range(TemplateIndex.LEARN_ALL + 2 * TemplateIndex.LEARN_EVERY)
+        ]
+        self.assertEqual(sum(learned), TemplateIndex.LEARN_ALL + 2)
+        self.assertTrue(all(learned[:TemplateIndex.LEARN_ALL]))
+        # Sampling keeps the site-wide ratio intact
+        self.assertEqual(template.strip(Parser.parse(make_page("Robots", chrome))), 1)
+
+    def test_recrawling_does_not_turn_pages_into_boilerplate(self):
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir, ignore_errors=True)
+        sections = {'title': True, 'paragraphs': True}
+        for _ in range(4):
+            engine = ScraperEngine(self.base_url, self.config(sections=sections, boilerplate=True, state_dir=state_dir))
+            pages = {page['title']: page for page in engine.run()}
+            self.assertEqual(pages["Guide"]['paragraphs'], ["The guide explains how crawlers pick pages."])
+        self.assertEqual(engine.template.stats()['pages_learned'], 2)
+
+        reloaded = TemplateIndex(engine.domain, StateStore('templates', state_dir))
+        self.assertFalse(reloaded.learn(Parser.parse(PAGES['/articles/guide']), self.base_url + "articles/guide"))
+
+    def test_crawl_feeds_search_index(self):
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir, ignore_errors=True)
+        sections = {'title': True, 'paragraphs': True}
+        ScraperEngine(self.base_url, self.config(sections=sections, index=True, state_dir=state_dir)).run()
+
+        results = get_index(os.path.join(state_dir, 'index')).search('crawlers pick')
+        self.assertEqual([r['title'] for r in results], ["Guide"])
+        self.assertIn("crawlers pick pages", results[0]['snippet'])
+
+    def test_image_probe_drops_tiny_images(self):
+        sections = {'images': True, 'probe_images': True}
+        engine = ScraperEngine(self.base_url + "gallery", self.config(sections=sections, depth=1))
+        images = engine.run()[0]['images']
+
+        self.assertEqual([image['alt'] for image in images], ["Photo of the team"])
+        self.assertEqual((images[0]['width'], images[0]['height'], images[0]['format']), ('640', '480', 'png'))
+        self.assertEqual(RANGE_HEADERS[-2:], ['bytes=0-16383'] * 2)
+        probe = engine.stats()['image_probe']
+        self.assertEqual(probe['probed'], 2)
+        self.assertLess(probe['bytes'], 20000)
+
+        jpeg = b'\xff\xd8\xff\xe0\x00\x10' + b'\x00' * 14 + b'\xff\xc0\x00\x11\x08\x00\x96\x01\x2c'
+        self.assertEqual(image_size(jpeg + b'\x00' * 8), ('jpeg', 300, 150))
+
+    def test_probe_backlog_is_bounded(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        prober = ImageProber(timeout=0.1, max_per_page=100)
+        prober.probe = lambda url: release.wait(5)
+
+        self.assertEqual(prober.probe_many(f"http://images.test/{i}.png" for i in range(100)), {})
+        probe = prober.stats()
+        self.assertEqual(probe['skipped'], 100 - MAX_QUEUED_PROBES)
+        # Only the probes already running are left on the shared executor
+        self.assertEqual(probe['cancelled'], MAX_QUEUED_PROBES - MAX_CONCURRENT_PROBES)
+
+    def test_page_memory_is_reported_per_stage(self):
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        engine = ScraperEngine(self.base_url, self.config(sections={'title': True, 'paragraphs': True}))
+        engine.run()
+
+        memory = engine.stats()['memory']
+        self.assertEqual(memory['pages'], 2)
+        self.assertEqual(list(memory['stages']), ['parse', 'extract', 'teardown'])
+        heaviest = memory['heaviest_pages'][0]
+        self.assertGreater(heaviest['peak_bytes'], heaviest['html_bytes'])
+        self.assertGreaterEqual(heaviest['peak_bytes'], heaviest['stages']['parse']['retained'])
+
+    def test_tree_is_released_when_extraction_fails(self):
+        engine = ScraperEngine(self.base_url, self.config(sections={'paragraphs': True}))
+        engine.content_filter.extract = mock.Mock(side_effect=RuntimeError("broken extractor"))
+        response = Fetcher().get(self.base_url)
+        released = []
+        with mock.patch('scraper.scraper.release_tree', released.append):
+            with self.assertRaises(RuntimeError):
+                engine.process_page(self.base_url, response, 0, PageMemory(self.base_url, len(response.content)))
+        self.assertEqual(len(released), 1)
+
+    def test_unknown_strategy_rejected(self):
+        with self.assertRaises(ValueError):
+            ScraperEngine(self.base_url, self.config(frontier={'strategy': 'random'}))
+
+
+if __name__ == "__main__":
+    unittest.main()
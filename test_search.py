@@ -0,0 +1,115 @@
+import unittest
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from scraper.search import SearchIndex, encode_varints, decode_varints
+
+PAGES = [
+    {
+        'url': 'https://example.com/crawling',
+        'title': 'Crawling basics',
+        'headings': ['How crawlers work'],
+        'paragraphs': ['A crawler fetches pages and follows links to discover more pages.'],
+    },
+    {
+        'url': 'https://example.com/parsing',
+        'title': 'Parsing HTML',
+        'paragraphs': ['Parsers turn markup into a tree that extractors can walk.'],
+        'tables': [{'headers': ['Parser', 'Speed'], 'rows': [['lxml', 'fast'], ['html5lib', 'slow']]}],
+    },
+    {
+        'url': 'https://example.com/politeness',
+        'title': 'Polite crawling',
+        'paragraphs': ['Respect robots.txt and crawl-delay so the crawler does not overload sites.'],
+        'links': [{'text': 'Robots exclusion standard', 'href': 'https://example.com/robots'}],
+    },
+]
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.index_dir, ignore_errors=True)
+
+    def build(self, pages):
+        index = SearchIndex(self.index_dir)
+        writer = index.writer()
+        for page in pages:
+            writer.write(page)
+        writer.close()
+        return index
+
+    def test_varint_round_trip(self):
+        numbers = [0, 1, 127, 128, 300, 2 ** 32]
+        self.assertEqual(decode_varints(encode_varints(numbers)), numbers)
+
+    def test_empty_index(self):
+        index = SearchIndex(os.path.join(self.index_dir, 'missing'))
+        self.assertEqual(index.search('crawling'), [])
+        self.assertEqual(index.stats()['documents'], 0)
+
+    def test_empty_index_directory(self):
+        # Fresh install: the directory exists but nothing was indexed yet
+        index = SearchIndex(self.index_dir)
+        self.assertEqual(index.stats(), {'segments': 0, 'documents': 0, 'terms': 0, 'bytes': 0})
+        self.assertEqual(index.search('crawling'), [])
+
+        # Another process indexes pages; this instance picks them up
+        self.build(PAGES)
+        self.assertEqual(index.search('crawling')[0]['url'], 'https://example.com/crawling')
+
+    def test_bm25_ranks_title_matches_first(self):
+        index = self.build(PAGES)
+        results = index.search('crawling')
+        self.assertEqual([r['url'] for r in results][:2],
+                         ['https://example.com/crawling', 'https://example.com/politeness'])
+
+        results = index.search('lxml')
+        self.assertEqual([r['url'] for r in results], ['https://example.com/parsing'])
+        self.assertIn('lxml', results[0]['snippet'])
+
+    def test_reindexed_page_replaces_old_copy_and_compacts(self):
+        self.build(PAGES)
+        updated = dict(PAGES[1], paragraphs=['Selectolax is another option for parsing.'], tables=[])
+        index = self.build([updated])
+        self.assertEqual(index.search('lxml'), [])
+        self.assertEqual(len(index.search('selectolax')), 1)
+
+        index.compact()
+        self.assertEqual(index.stats()['segments'], 1)
+        self.assertEqual(index.stats()['documents'], 3)
+
+        # A fresh reader sees the compacted index
+        reopened = SearchIndex(self.index_dir)
+        self.assertEqual([r['url'] for r in reopened.search('robots')], ['https://example.com/politeness'])
+        self.assertEqual(len([name for name in os.listdir(self.index_dir) if name.endswith('.post')]), 1)
+
+    def test_processes_sharing_a_directory_keep_every_segment(self):
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_add_pages, args=(self.index_dir, worker, 20))
+                   for worker in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+            self.assertEqual(worker.exitcode, 0)
+
+        self.assertEqual(SearchIndex(self.index_dir).stats()['documents'], 80)
+
+
+def _add_pages(directory, worker, count):
+    # One segment per page, as many small crawls in separate workers would
+    index = SearchIndex(directory)
+    for number in range(count):
+        writer = index.writer()
+        writer.write({'url': f'https://example.com/{worker}/{number}', 'title': f'Page {number}'})
+        writer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
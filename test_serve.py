@@ -0,0 +1,151 @@
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import requests
+
+from scraper.runtime import WarmUp
+from serve import PooledWSGIServer
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class TestWarmUp(unittest.TestCase):
+
+    def test_steps_are_timed_and_run_once(self):
+        calls = []
+        warm_up = WarmUp()
+        steps = [('first', lambda: calls.append(1)), ('second', lambda: calls.append(2))]
+        self.assertTrue(warm_up.run(steps))
+        self.assertTrue(warm_up.run(steps))
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(set(warm_up.stats()['steps']), {'first', 'second'})
+
+    def test_failed_step_is_reported(self):
+        def broken():
+            raise OSError("disk unavailable")
+
+        warm_up = WarmUp()
+        self.assertFalse(warm_up.run([('index', broken)]))
+        self.assertEqual(warm_up.state, 'failed')
+        self.assertIn('disk unavailable', warm_up.stats()['error'])
+
+
+class TestPooledWSGIServer(unittest.TestCase):
+
+    def test_busy_worker_leaves_connections_in_backlog(self):
+        release = threading.Event()
+
+        def app(environ, start_response):
+            release.wait(5)
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'done']
+
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(16)
+        self.addCleanup(listener.close)
+        host, port = listener.getsockname()
+        server = PooledWSGIServer(host, port, app, 1, listener.fileno())
+        accepted = []
+        get_request = server.get_request
+        server.get_request = lambda: accepted.append(1) or get_request()
+        thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05})
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.shutdown)
+
+        responses = []
+
+        def fetch():
+            responses.append(requests.get(f"http://{host}:{port}/", timeout=5).text)
+
+        clients = [threading.Thread(target=fetch) for _ in range(2)]
+        for client in clients:
+            client.start()
+            time.sleep(0.2)
+        # The only thread is busy, so the second connection waits unaccepted
+        self.assertEqual(len(accepted), 1)
+
+        release.set()
+        for client in clients:
+            client.join(5)
+        self.assertEqual(responses, ['done', 'done'])
+        self.assertEqual(len(accepted), 2)
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), "pre-forking needs os.fork")
+class TestServe(unittest.TestCase):
+
+    def setUp(self):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        # Keep the workers' state and exports out of the working directory
+        self.state_dir = tempfile.mkdtemp()
+        env = dict(
+            os.environ,
+            SCRAPER_STATE_DIR=self.state_dir,
+            SCRAPER_INDEX_DIR=os.path.join(self.state_dir, 'index'),
+            SCRAPER_EXPORT_DIR=os.path.join(self.state_dir, 'exports')
+        )
+        self.process = subprocess.Popen(
+            [sys.executable, 'serve.py', '--workers', '2', '--threads', '2', '--port', str(self.port)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True
+        )
+
+    def tearDown(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+        shutil.rmtree(self.state_dir, ignore_errors=True)
+
+    def ready(self, timeout=15):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                response = requests.get(f"{self.url}/ready", timeout=2)
+                if response.status_code == 200:
+                    return response.json()
+            except requests.exceptions.ConnectionError:
+                pass
+            time.sleep(0.1)
+        self.fail("server did not become ready")
+
+    def test_workers_warm_up_serve_and_stop(self):
+        status = self.ready()
+        self.assertEqual(status['state'], 'ready')
+        self.assertIn('summarizer', status['steps'])
+        self.assertGreater(status['rss_mb'], 0)
+        self.assertEqual(requests.get(f"{self.url}/health").json()['warm_up'], 'ready')
+
+        pids = {self.ready()['pid'] for _ in range(30)}
+        self.assertTrue(pids)
+        self.assertNotIn(self.process.pid, pids)
+
+        # A dead worker is replaced
+        os.kill(pids.pop(), signal.SIGKILL)
+        self.ready()
+
+        self.process.send_signal(signal.SIGTERM)
+        self.assertEqual(self.process.wait(timeout=15), 0)
+        self.assertIn('workers ready', self.process.stdout.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
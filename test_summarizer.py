@@ -46,6 +46,42 @@ class TestSummarizer(unittest.TestCase):
         self.assertGreater(sim1_2, 0.6, "Similar sentences should have high score")
         self.assertLess(sim1_3, 0.4, "Different sentences should have low score")
 
+    def test_incremental_rank_reuses_unchanged_sentences(self):
+        sentences = [
+            "Python is a popular language for data analysis.",
+            "Many teams use Python for web development and scripting.",
+            "The language has a large standard library.",
+            "Data analysis in Python relies on a few key libraries.",
+        ]
+        cold = self.engine.text_rank_score(sentences)
+        ranked, state, counters = self.engine.incremental_text_rank(sentences)
+        self.assertEqual(ranked, cold)
+        self.assertEqual(counters['similarities_computed'], 6)
+
+        # One edited sentence: only its row/column is recomputed
+        edited = sentences[:2] + ["The language ships with a very large standard library."] + sentences[3:]
+        ranked, _, counters = self.engine.incremental_text_rank(edited, state)
+        self.assertEqual(counters['sentences_reused'], 3)
+        self.assertEqual(counters['similarities_reused'], 3)
+        self.assertEqual(counters['similarities_computed'], 3)
+        self.assertEqual([s for _, _, s in ranked][:1], [s for _, _, s in self.engine.text_rank_score(edited)][:1])
+
+    def test_incremental_rank_keeps_repeated_sentences_similar(self):
+        # A pull quote repeats a sentence from the body
+        sentences = [
+            "The council approved the new budget for public transport.",
+            "Bus fares will stay the same for the next two years.",
+            "The budget adds three new tram lines to the city network.",
+            "Bus fares will stay the same for the next two years.",
+            "Cycling groups asked for more protected lanes in the plan.",
+            "The council will vote on the cycling plan next spring.",
+        ]
+        _, state, _ = self.engine.incremental_text_rank(sentences)
+        edited = sentences[:4] + ["Cycling groups asked the council for more protected lanes."] + sentences[5:]
+        ranked, new_state, _ = self.engine.incremental_text_rank(edited, state)
+        self.assertEqual(new_state.matrix[1][3], 1.0)
+        self.assertEqual([i for _, i, _ in ranked], [i for _, i, _ in self.engine.text_rank_score(edited)])
+
     def test_summary_generation(self):
         payload = {"url": self.TEST_URL, "length": "medium"}
         response = requests.post(self.BASE_URL, json=payload)
@@ -0,0 +1,86 @@
+import unittest
+
+from bs4 import BeautifulSoup
+
+from scraper.parser import Parser
+from scraper.tables import extract_tables, infer_column
+
+SPANNED = """
+<table>
+  <thead>
+    <tr><th rowspan="2">Region</th><th colspan="2">Sales</th></tr>
+    <tr><th>2023</th><th>2024</th></tr>
+  </thead>
+  <tbody>
+    <tr><td rowspan="2">North</td><td>1,200</td><td>1,350.5</td></tr>
+    <tr><td>900</td><td></td></tr>
+    <tr><td>South</td><td colspan="2">n/a</td></tr>
+  </tbody>
+</table>
+"""
+
+
+class TestTables(unittest.TestCase):
+
+    def test_spans_are_expanded(self):
+        table = extract_tables(Parser.parse(SPANNED))[0]
+        self.assertEqual(table['headers'], ["Region", "Sales / 2023", "Sales / 2024"])
+        self.assertEqual(table['rows'], [
+            ["North", "1,200", "1,350.5"],
+            ["North", "900", ""],
+            ["South", "n/a", "n/a"],
+        ])
+
+    def test_typed_columns(self):
+        table = extract_tables(Parser.parse(SPANNED), columns=True, infer_types=True)[0]
+        self.assertNotIn('rows', table)
+        self.assertEqual(table['row_count'], 3)
+        self.assertEqual(table['types'], ['str', 'str', 'str'])
+        self.assertEqual(table['columns'][0], ["North", "North", "South"])
+
+        self.assertEqual(infer_column(["1,200", "900", ""]), ('int', [1200, 900, None]))
+        self.assertEqual(infer_column(["1.5", "2"]), ('float', [1.5, 2.0]))
+        self.assertEqual(infer_column(["2024-01-05", "March 3, 2024"]), ('date', ['2024-01-05', '2024-03-03']))
+        self.assertEqual(infer_column(["007", "12"])[0], 'str')
+
+    def test_spans_into_trailing_columns(self):
+        html = """
+        <table>
+          <tr><th>A</th><th>B</th><th>C</th></tr>
+          <tr><td>1</td><td rowspan="3">tall</td><td rowspan="2">mid</td></tr>
+          <tr><td>2</td></tr>
+          <tr><td>3</td></tr>
+          <tr><td>4</td></tr>
+        </table>
+        """
+        table = extract_tables(Parser.parse(html))[0]
+        self.assertEqual(table['rows'], [
+            ["1", "tall", "mid"],
+            ["2", "tall", "mid"],
+            ["3", "tall"],
+            ["4"],
+        ])
+
+    def test_nested_tables_stay_in_outer_cell(self):
+        html = "<table><tr><th>A</th><th>B</th></tr><tr><td>1</td><td><table><tr><td>x</td></tr></table></td></tr></table>"
+        tables = extract_tables(Parser.parse(html))
+        self.assertEqual(len(tables), 1)
+        self.assertEqual(tables[0]['rows'], [["1", "x"]])
+
+    def test_rows_inside_a_form(self):
+        # Legacy pages wrap rows in a <form>; both parsers keep it in place
+        html = """
+        <table><form action="/update">
+          <tr><th>Name</th><th>Qty</th></tr>
+          <tr><td>Bolts</td><td>40</td></tr>
+          <tr><td>Nuts<table><tr><td>inner</td></tr></table></td><td>12</td></tr>
+        </form></table>
+        """
+        for soup in (Parser.parse(html), BeautifulSoup(html, 'html.parser')):
+            tables = extract_tables(soup)
+            self.assertEqual(tables[0]['headers'], ["Name", "Qty"])
+            self.assertEqual(tables[0]['rows'], [["Bolts", "40"], ["Nuts inner", "12"]])
+
+
+if __name__ == "__main__":
+    unittest.main()